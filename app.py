@@ -29,6 +29,12 @@ def create_app():
         config.validate()
         logger.info("Configuration validated successfully")
         
+        # Bound disk usage: drop exports left over from earlier runs
+        if config.EXPORTS_MAX_AGE_HOURS > 0:
+            from services.data_export import DataExportService
+            removed = DataExportService.cleanup_exports(config.EXPORTS_MAX_AGE_HOURS * 3600)
+            logger.info(f"Removed {removed} exports older than {config.EXPORTS_MAX_AGE_HOURS:g}h")
+        
         # Register blueprints
         app.register_blueprint(slack_bp)
         
@@ -41,8 +47,15 @@ def create_app():
         
         # Display schema summary
         from services.database import DatabaseService
+        if config.SQLITE_ANALYZE_ON_STARTUP:
+            DatabaseService.analyze_database()
         schema_summary = DatabaseService.get_database_schema()
         logger.info(f"Database schema loaded: {len(schema_summary)} characters")
+
+        # Warm the semantic NL→SQL cache so the first question doesn't pay for it
+        if config.USE_SEMANTIC_CACHE:
+            from services.semantic_cache import semantic_cache
+            semantic_cache.initialize()
         
         return app
         
@@ -2,10 +2,32 @@
 Configuration management for CircularQuery.
 """
 import os
+import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Load environment variables once per process tree; reloader children and
+# re-imports inherit the already-populated environment
+if not os.environ.get("_DOTENV_LOADED"):
+    load_dotenv()
+    os.environ["_DOTENV_LOADED"] = "1"
+
+
+def _build_http_session() -> requests.Session:
+    """Shared keep-alive session so Slack/Ollama calls reuse pooled connections."""
+    session = requests.Session()
+    # POST is not in Retry's default allowed methods, so only failed connects are
+    # retried and a message is never posted twice.
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=3, backoff_factor=0.2),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-# Load environment variables
-load_dotenv()
 
 class Config:
     """Base configuration class."""
@@ -31,6 +53,13 @@ class Config:
     RAG_TOP_K_TABLES = int(os.getenv("RAG_TOP_K_TABLES", "5"))
     RAG_TOP_N_COLUMNS = int(os.getenv("RAG_TOP_N_COLUMNS", "8"))
 
+    # Semantic NL→SQL cache (skip the LLM for previously answered questions)
+    USE_SEMANTIC_CACHE = os.getenv("USE_SEMANTIC_CACHE", "false").lower() in ("1", "true", "yes")
+    SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "./semantic_cache.db")
+    SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "all-MiniLM-L6-v2")
+    SEMANTIC_CACHE_HIGH = float(os.getenv("SEMANTIC_CACHE_HIGH", "0.95"))
+    SEMANTIC_CACHE_LOW = float(os.getenv("SEMANTIC_CACHE_LOW", "0.85"))
+
     # Agent pacing (to mitigate rate limits during RAG-enabled investigations)
     AGENT_MAX_ITER_RAG = int(os.getenv("AGENT_MAX_ITER_RAG", "3"))
     AGENT_ITERATION_DELAY = float(os.getenv("AGENT_ITERATION_DELAY", "1.0"))
@@ -41,9 +70,18 @@ class Config:
     # Database Configuration
     SQLITE_PATH = os.getenv("SQLITE_PATH", "./chinook.db")
     SCHEMA_YAML_PATH = os.getenv("SCHEMA_YAML_PATH", "./schema.yaml")
+    # Read-side SQLite tuning applied to every pooled connection
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    # Refresh planner statistics once at startup (opens the DB read-write briefly)
+    SQLITE_ANALYZE_ON_STARTUP = os.getenv("SQLITE_ANALYZE_ON_STARTUP", "false").lower() in ("1", "true", "yes")
     
     # Application Configuration
     EXPORTS_DIR = "./exports"
+    # Exports older than this are deleted at startup (0 disables cleanup)
+    EXPORTS_MAX_AGE_HOURS = float(os.getenv("EXPORTS_MAX_AGE_HOURS", "24"))
+    # Resolution of plot PNGs posted to Slack (previews render ~800px wide)
+    PLOT_DPI = int(os.getenv("PLOT_DPI", "150"))
     ROWS_PER_PAGE = 12
     # Allow overriding default query limit via environment variable
     # Set to 0 or negative value to disable limit entirely
@@ -52,10 +90,19 @@ class Config:
     
     # Optional Configuration
     NGROK_AUTHTOKEN = os.getenv("NGROK_AUTHTOKEN", "")
+
+    # Pooled HTTP client for Slack, response_url and Ollama calls. Auth headers are
+    # passed per request so the Slack token is never sent to other hosts.
+    HTTP_SESSION = _build_http_session()
+    
+    _validated = False
     
     @classmethod
     def validate(cls):
-        """Validate required configuration."""
+        """Validate required configuration (checked once per process)."""
+        if cls._validated:
+            return
+        
         if not cls.SLACK_BOT_TOKEN:
             raise ValueError("SLACK_BOT_TOKEN is required")
         
@@ -71,6 +118,7 @@ class Config:
         
         # Create exports directory if it doesn't exist
         os.makedirs(cls.EXPORTS_DIR, exist_ok=True)
+        cls._validated = True
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -8,7 +8,95 @@ from typing import Tuple
 
 logger = logging.getLogger(__name__)
 
-ALLOWED_SELECT = re.compile(r"^\s*(WITH\s+.+?AS\s*\(.*?\)\s*)*SELECT\b", re.IGNORECASE | re.DOTALL)
+# Queries longer than this are rejected before any pattern matching
+MAX_SQL_LENGTH = 16 * 1024
+
+# Compiled once at import; sanitize_sql runs on every generated query.
+# Every pattern here is matched in linear time: nothing nests quantifiers or
+# scans unanchored runs, so malformed LLM output can't trigger backtracking.
+SELECT_RE = re.compile(r"SELECT\b", re.IGNORECASE)
+WITH_RE = re.compile(r"WITH\s", re.IGNORECASE)
+CTE_OPEN_RE = re.compile(r"AS\s*\(", re.IGNORECASE)
+CTE_SELECT_RE = re.compile(r"\)\s*SELECT\b", re.IGNORECASE)
+WORD_RE = re.compile(r"\w")
+
+# Single-quoted literals and double-quoted, [bracketed] and `backticked`
+# identifiers. One alternation scanned left to right, so whichever quote opens
+# first owns the text up to its close: a ' inside [a'b] never starts a literal.
+QUOTED_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\[[^\]]*\]|`(?:[^`]|``)*`")
+
+LEADING_EDGE_RE = re.compile(r"[\s`]*")
+TRAILING_EDGE_RE = re.compile(r"[\s`;]*")  # matched against the reversed string
+SQL_PREFIX_RE = re.compile(r"^sql(?:\s*\n|\s*$)\s*", re.IGNORECASE)
+LIMIT_RE = re.compile(r"\bLIMIT\b\s+(\d+)", re.IGNORECASE)
+
+# Forbidden keywords and comment markers folded into one alternation so the
+# query is scanned in a single pass instead of once per pattern
+FORBIDDEN_KEYWORDS = (
+    "INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "TRUNCATE", "ATTACH", "DETACH",
+    "PRAGMA", "VACUUM", "REINDEX", "ANALYZE",
+    "CREATE", "REPLACE",
+    "EXEC", "EXECUTE",
+)
+FORBIDDEN_RE = re.compile(
+    r"\b(?:" + "|".join(sorted(FORBIDDEN_KEYWORDS, key=len, reverse=True)) + r")\b"
+    r"|--"  # SQL comments
+    r"|/\*",  # Block comments
+    re.IGNORECASE,
+)
+
+SUSPICIOUS_PATTERNS = [
+    re.compile(r"\b(pg_|information_schema|sys\.|mysql\.)", re.IGNORECASE),  # System tables/schemas
+]
+
+TABLE_NAME_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9_]*$")
+SYSTEM_TABLE_RE = re.compile(r"^(sqlite_|pg_|information_schema|sys|mysql)", re.IGNORECASE)
+
+
+def _strip_edges(s: str) -> str:
+    """Strip whitespace and code fences from both ends, plus trailing semicolons."""
+    start = LEADING_EDGE_RE.match(s).end()
+    end = len(s) - TRAILING_EDGE_RE.match(s[::-1]).end()
+    return s[start:end]
+
+
+def _mask_quoted(s: str) -> str:
+    """
+    Empty out quoted literals and identifiers so keyword checks only see SQL.
+    
+    `WHERE note = 'drop by'` is then no longer a forbidden keyword. An
+    unterminated quote is left as-is, so its contents are still scanned.
+    """
+    return QUOTED_RE.sub(lambda m: m.group(0)[0] + m.group(0)[-1], s)
+
+
+def _is_select(s: str) -> bool:
+    """True if the query is a SELECT, or a WITH … AS (…) CTE followed by SELECT."""
+    if SELECT_RE.match(s):
+        return True
+    if not WITH_RE.match(s):
+        return False
+    cte = CTE_OPEN_RE.search(s)
+    return bool(cte and CTE_SELECT_RE.search(s, cte.end()))
+
+
+def is_select_query(sql: str) -> bool:
+    """
+    True if sql is a SELECT or a WITH … AS (…) SELECT CTE.
+    
+    The same check sanitize_sql applies, for callers that need to vet SQL
+    before running the full guardrails.
+    """
+    return _is_select(_mask_quoted((sql or "").strip()))
+
+
+def _has_multiple_statements(s: str) -> bool:
+    """True if any line has a word character after a semicolon."""
+    for line in s.split("\n"):
+        semicolon = line.find(";")
+        if semicolon != -1 and WORD_RE.search(line, semicolon + 1):
+            return True
+    return False
 
 
 def sanitize_sql(sql: str, default_limit: int = 500) -> Tuple[bool, str, str]:
@@ -32,57 +120,52 @@ def sanitize_sql(sql: str, default_limit: int = 500) -> Tuple[bool, str, str]:
         logger.warning("Empty or non-string SQL provided")
         return False, "", "empty_sql"
 
+    if len(sql) > MAX_SQL_LENGTH:
+        logger.warning(f"SQL rejected: {len(sql)} characters exceeds {MAX_SQL_LENGTH}")
+        return False, "", "sql_too_long"
+
     # Clean up common formatting issues
-    s = sql.strip().strip("`")
-    s = re.sub(r"^sql\s*\n", "", s, flags=re.IGNORECASE).strip()
-    s = s.rstrip(";").strip()
+    s = _strip_edges(sql)
+    s = SQL_PREFIX_RE.sub("", s)
     
     # Check for empty query after cleanup
     if not s:
         return False, "", "empty_sql_after_cleanup"
 
+    # Structural checks run on a copy with quoted text masked out
+    masked = _mask_quoted(s)
+
     # Must start with SELECT (optionally WITH…)
-    if not ALLOWED_SELECT.match(s):
+    if not _is_select(masked):
         logger.warning(f"Non-SELECT query rejected: {s[:100]}...")
         return False, "", "non_select_or_unsafe"
 
     # Enhanced forbidden keywords check
-    forbidden_patterns = [
-        r"\b(INSERT|UPDATE|DELETE|DROP|ALTER|TRUNCATE|ATTACH|DETACH)\b",
-        r"\b(PRAGMA|VACUUM|REINDEX|ANALYZE)\b",
-        r"\b(CREATE|REPLACE)\b",
-        r"\b(EXEC|EXECUTE)\b",
-        r"--",  # SQL comments
-        r"/\*",  # Block comments
-    ]
-    
-    for pattern in forbidden_patterns:
-        if re.search(pattern, s, flags=re.IGNORECASE):
-            logger.warning(f"Forbidden pattern found: {pattern} in query: {s[:100]}...")
-            return False, "", "forbidden_keyword"
+    forbidden = FORBIDDEN_RE.search(masked)
+    if forbidden:
+        logger.warning(f"Forbidden pattern found: {forbidden.group(0)} in query: {s[:100]}...")
+        return False, "", "forbidden_keyword"
 
     # Check for suspicious characters or sequences
-    suspicious_patterns = [
-        r";.*\w",  # Multiple statements (multi-statement)
-        r"\b(pg_|information_schema|sys\.|mysql\.)",  # System tables/schemas
-    ]
-    
-    for pattern in suspicious_patterns:
-        if re.search(pattern, s, flags=re.IGNORECASE):
-            logger.warning(f"Suspicious pattern found: {pattern} in query: {s[:100]}...")
+    if _has_multiple_statements(masked):
+        logger.warning(f"Multiple statements found in query: {s[:100]}...")
+        return False, "", "suspicious_pattern"
+
+    for pattern in SUSPICIOUS_PATTERNS:
+        if pattern.search(masked):
+            logger.warning(f"Suspicious pattern found: {pattern.pattern} in query: {s[:100]}...")
             return False, "", "suspicious_pattern"
 
     # Add LIMIT if not present (unless limit is disabled)
-    if not re.search(r"\bLIMIT\b\s+\d+", s, flags=re.IGNORECASE):
+    limit_match = LIMIT_RE.search(masked)
+    if not limit_match:
         if default_limit > 0:  # Only add limit if not disabled
             s = f"{s} LIMIT {default_limit}"
     else:
         # Check if existing limit is reasonable (unless limit checking is disabled)
-        if default_limit > 0:  # Only enforce limit checks if not disabled
-            limit_match = re.search(r"\bLIMIT\b\s+(\d+)", s, flags=re.IGNORECASE)
-            if limit_match and int(limit_match.group(1)) > 10000:
-                logger.warning(f"Excessive LIMIT value: {limit_match.group(1)}")
-                return False, "", "excessive_limit"
+        if default_limit > 0 and int(limit_match.group(1)) > 10000:
+            logger.warning(f"Excessive LIMIT value: {limit_match.group(1)}")
+            return False, "", "excessive_limit"
 
     logger.info(f"SQL query sanitized successfully: {s[:100]}...")
     return True, s, ""
@@ -102,20 +185,11 @@ def validate_table_name(table_name: str) -> bool:
         return False
         
     # Allow only alphanumeric, underscore, and basic characters
-    if not re.match(r"^[a-zA-Z][a-zA-Z0-9_]*$", table_name):
+    if not TABLE_NAME_RE.match(table_name):
         return False
         
     # Reject system table patterns
-    system_patterns = [
-        r"^sqlite_",
-        r"^pg_",
-        r"^information_schema",
-        r"^sys",
-        r"^mysql",
-    ]
-    
-    for pattern in system_patterns:
-        if re.match(pattern, table_name, re.IGNORECASE):
-            return False
+    if SYSTEM_TABLE_RE.match(table_name):
+        return False
             
     return True
\ No newline at end of file
@@ -5,6 +5,7 @@ import json
 import os
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from flask import Blueprint, request, jsonify, send_from_directory
 from typing import Dict, Any
 
@@ -21,7 +22,9 @@ from utils.formatting import (
     paginate_query_results, 
     calculate_pagination_info,
     extract_sql_from_slack_message,
-    parse_page_command
+    parse_page_command,
+    get_cached_page,
+    cache_page
 )
 from models.slack import (
     QueryRequest, 
@@ -33,8 +36,13 @@ from models.slack import (
 # Create Blueprint
 slack_bp = Blueprint('slack', __name__, url_prefix='/slack')
 
-# Get database schema once at startup
-DATABASE_SCHEMA = DatabaseService.get_database_schema()
+# Plot rendering is CPU-bound (pandas + Agg + PNG encode); a bounded pool keeps a
+# burst of button clicks from spawning more render threads than there are cores
+PLOT_EXECUTOR = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="plot")
+
+# Uploads are network-bound (three sequential Slack round-trips); handing them to
+# their own pool frees the render worker as soon as the PNG is encoded
+UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="upload")
 
 
 @slack_bp.route('/sqlquery', methods=['POST'])
@@ -106,11 +114,7 @@ def handle_slack_interactions():
                 
             elif action.action_id == 'generate_plot_button':
                 # Handle plot generation
-                threading.Thread(
-                    target=_generate_plot,
-                    args=(user_id, response_url, channel_id, action.value),
-                    daemon=True
-                ).start()
+                PLOT_EXECUTOR.submit(_generate_plot, user_id, response_url, channel_id, action.value)
                 return jsonify({"text": "Generating plot..."}), 200
                 
             elif action.action_id == 'export_csv':
@@ -326,8 +330,7 @@ def help_command():
         }
         
         if response_url:
-            import requests
-            requests.post(response_url, json=help_message)
+            config.HTTP_SESSION.post(response_url, json=help_message)
         
         return '', 204
         
@@ -346,8 +349,6 @@ def download_file(filename):
 
 def _process_sql_query(query_request: QueryRequest):
     """Process SQL query in background thread."""
-    import requests
-    
     try:
         print(f"[DEBUG] Processing query: '{query_request.question}' for user {query_request.user_id}")
         print(f"[DEBUG] Response URL: {query_request.response_url}")
@@ -357,7 +358,7 @@ def _process_sql_query(query_request: QueryRequest):
         # Generate SQL from natural language
         print(f"[DEBUG] Generating SQL with {config.LLM_BACKEND}...")
         llm_start = time.time()
-        sql_query = LLMService.get_sql_query(query_request.question, DATABASE_SCHEMA)
+        sql_query = LLMService.get_sql_query(query_request.question, DatabaseService.get_database_schema())
         llm_time = time.time() - llm_start
         print(f"[DEBUG] LLM took {llm_time:.2f}s, generated: {sql_query}")
         
@@ -367,35 +368,41 @@ def _process_sql_query(query_request: QueryRequest):
                 "text": "I couldn't generate a safe SELECT statement for SQLite. Try rephrasing your question."
             }
             print(f"[DEBUG] Posting error response to: {query_request.response_url}")
-            response = requests.post(query_request.response_url, json=error_response, timeout=10)
+            response = config.HTTP_SESSION.post(query_request.response_url, json=error_response, timeout=10)
             print(f"[DEBUG] Error response status: {response.status_code}")
             return
         
-        # Execute query
-        result = DatabaseService.execute_query(sql_query)
-        
-        if "error" in result:
-            requests.post(query_request.response_url, json={
-                "response_type": "in_channel",
-                "text": f"SQL error: {result['error']}"
-            })
-            return
-        
-        data = result["data"]
-        
-        if not data:
-            requests.post(query_request.response_url, json={
-                "response_type": "in_channel",
-                "text": f"SQL Query: ```{sql_query}```\nNo data found."
-            })
-            return
-        
-        # Calculate pagination
-        pagination = calculate_pagination_info(len(data), query_request.page_number, config.ROWS_PER_PAGE)
-        
-        # Get page slice
-        page_data = paginate_query_results(data, query_request.page_number, config.ROWS_PER_PAGE)
-        formatted_table = format_data_as_table(page_data)
+        # Page clicks re-run the same SQL: reuse the rendered page while it's fresh
+        cached_page = get_cached_page(sql_query, query_request.page_number, config.ROWS_PER_PAGE)
+        if cached_page:
+            formatted_table, pagination = cached_page
+        else:
+            # Execute query
+            result = DatabaseService.execute_query(sql_query)
+            
+            if "error" in result:
+                config.HTTP_SESSION.post(query_request.response_url, json={
+                    "response_type": "in_channel",
+                    "text": f"SQL error: {result['error']}"
+                })
+                return
+            
+            data = result["data"]
+            
+            if not data:
+                config.HTTP_SESSION.post(query_request.response_url, json={
+                    "response_type": "in_channel",
+                    "text": f"SQL Query: ```{sql_query}```\nNo data found."
+                })
+                return
+            
+            # Calculate pagination
+            pagination = calculate_pagination_info(len(data), query_request.page_number, config.ROWS_PER_PAGE)
+            
+            # Get page slice
+            page_data = paginate_query_results(data, query_request.page_number, config.ROWS_PER_PAGE)
+            formatted_table = format_data_as_table(page_data)
+            cache_page(sql_query, query_request.page_number, config.ROWS_PER_PAGE, formatted_table, pagination)
         
         # Create action buttons in 2 clean rows
         # Row 1: Main actions (max 5 buttons)
@@ -452,7 +459,7 @@ def _process_sql_query(query_request: QueryRequest):
         
         print(f"[DEBUG] Posting success response to: {query_request.response_url}")
         print(f"[DEBUG] Total processing time: {time.time() - start_time:.2f}s")
-        response = requests.post(query_request.response_url, json=message, timeout=10)
+        response = config.HTTP_SESSION.post(query_request.response_url, json=message, timeout=10)
         print(f"[DEBUG] Success response status: {response.status_code}")
         if response.status_code != 200:
             print(f"[DEBUG] Response error: {response.text}")
@@ -467,7 +474,7 @@ def _process_sql_query(query_request: QueryRequest):
                 "response_type": "ephemeral",
                 "text": f"Error processing query: {str(e)}"
             }
-            response = requests.post(query_request.response_url, json=error_response, timeout=10)
+            response = config.HTTP_SESSION.post(query_request.response_url, json=error_response, timeout=10)
             print(f"[DEBUG] Exception response status: {response.status_code}")
         except Exception as post_error:
             print(f"Failed to post error response: {post_error}")
@@ -475,18 +482,16 @@ def _process_sql_query(query_request: QueryRequest):
 
 def _export_csv(query_text: str, response_url: str, payload: Dict[str, Any]):
     """Export CSV in background thread."""
-    import requests
-    
     try:
         channel_id = payload.get('channel', {}).get('id', '')
         
         # Try to get SQL from original message, otherwise regenerate
         sql_query = extract_sql_from_slack_message(payload)
         if not sql_query:
-            sql_query = LLMService.get_sql_query(query_text, DATABASE_SCHEMA)
+            sql_query = LLMService.get_sql_query(query_text, DatabaseService.get_database_schema())
         
         if not sql_query:
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": "Could not generate SQL for CSV export."
             })
@@ -495,47 +500,45 @@ def _export_csv(query_text: str, response_url: str, payload: Dict[str, Any]):
         # Execute query
         result = DatabaseService.execute_query(sql_query)
         if "error" in result:
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": f"SQL error during CSV export: {result['error']}"
             })
             return
         
-        # Generate CSV
-        csv_content = DataExportService.generate_csv_from_data(result["data"])
-        if not csv_content:
-            requests.post(response_url, json={
+        # Write the CSV straight to exports, then stream the file to Slack so the
+        # export is never held in memory as one string
+        csv_filepath = DataExportService.save_csv_from_data(result["data"], query_text)
+        if not csv_filepath:
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": "Failed to generate CSV content."
             })
             return
         
-        # Save and upload CSV
-        csv_filepath = DataExportService.save_csv_to_storage(csv_content, query_text)
-        
-        with open(csv_filepath, "rb") as f:
+        with open(csv_filepath, "rb") as csv_file:
             success, response = SlackService.upload_file(
                 channel_id,
-                f.read(),
+                csv_file,
                 filename=f"query_export_{int(time.time())}.csv",
                 title="Query Export",
                 initial_comment="Here is your CSV export."
             )
         
         if success:
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": "CSV uploaded successfully ✅"
             })
         else:
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": f"Failed to upload CSV: {response}"
             })
             
     except Exception as e:
         print(f"Error exporting CSV: {e}")
-        requests.post(response_url, json={
+        config.HTTP_SESSION.post(response_url, json={
             "response_type": "ephemeral",
             "text": f"Error exporting CSV: {str(e)}"
         })
@@ -543,8 +546,6 @@ def _export_csv(query_text: str, response_url: str, payload: Dict[str, Any]):
 
 def _process_askdb_investigation(investigation_request: QueryRequest):
     """Process business question investigation in background thread."""
-    import requests
-    
     try:
         print(f"[DEBUG] Processing askdb investigation: '{investigation_request.question}' for user {investigation_request.user_id}")
         print(f"[DEBUG] Response URL: {investigation_request.response_url}")
@@ -592,7 +593,7 @@ def _process_askdb_investigation(investigation_request: QueryRequest):
         print(f"[DEBUG] Analysis result preview: {analysis_result[:300]}...")
         print(f"[DEBUG] Analysis result length: {len(analysis_result)} characters")
         print(f"[DEBUG] Posting investigation result to: {investigation_request.response_url}")
-        response = requests.post(investigation_request.response_url, json=message, timeout=10)
+        response = config.HTTP_SESSION.post(investigation_request.response_url, json=message, timeout=10)
         print(f"[DEBUG] Investigation response status: {response.status_code}")
         if response.status_code != 200:
             print(f"[DEBUG] Response error: {response.text}")
@@ -607,7 +608,7 @@ def _process_askdb_investigation(investigation_request: QueryRequest):
                 "response_type": "in_channel",
                 "text": f"❌ **Investigation Failed**\n\nI encountered an error while investigating: *{investigation_request.question}*\n\nError: {str(e)}\n\nPlease try rephrasing your question or contact support."
             }
-            response = requests.post(investigation_request.response_url, json=error_response, timeout=10)
+            response = config.HTTP_SESSION.post(investigation_request.response_url, json=error_response, timeout=10)
             print(f"[DEBUG] Error response status: {response.status_code}")
         except Exception as post_error:
             print(f"Failed to post investigation error response: {post_error}")
@@ -740,18 +741,16 @@ def _convert_markdown_to_slack(markdown_text: str) -> str:
 
 def _prepare_plot(query_text: str, response_url: str, payload: Dict[str, Any], plot_type: str = 'bar'):
     """Prepare plot options in background thread."""
-    import requests
-    
     try:
         user_id = payload.get('user', {}).get('id', '')
         
         # Generate CSV for plotting
         sql_query = extract_sql_from_slack_message(payload)
         if not sql_query:
-            sql_query = LLMService.get_sql_query(query_text, DATABASE_SCHEMA)
+            sql_query = LLMService.get_sql_query(query_text, DatabaseService.get_database_schema())
         
         if not sql_query:
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": "Could not generate SQL for plotting."
             })
@@ -759,27 +758,26 @@ def _prepare_plot(query_text: str, response_url: str, payload: Dict[str, Any], p
         
         result = DatabaseService.execute_query(sql_query)
         if "error" in result:
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": f"SQL error: {result['error']}"
             })
             return
         
-        csv_content = DataExportService.generate_csv_from_data(result["data"])
-        if not csv_content:
-            requests.post(response_url, json={
+        csv_filepath = DataExportService.save_csv_from_data(result["data"], query_text)
+        if not csv_filepath:
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": "No data available for plotting."
             })
             return
         
-        csv_filepath = DataExportService.save_csv_to_storage(csv_content, query_text)
         session_manager.store_user_selection(user_id, "CSV", csv_filepath)
         session_manager.store_user_selection(user_id, "PLOT_TYPE", plot_type)
         
         columns = DataExportService.get_csv_columns(csv_filepath)
         if not columns:
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": "No columns found for plotting."
             })
@@ -867,14 +865,14 @@ def _prepare_plot(query_text: str, response_url: str, payload: Dict[str, Any], p
                 }
             ]
         
-        requests.post(response_url, json={
+        config.HTTP_SESSION.post(response_url, json={
             "response_type": "ephemeral",
             "blocks": blocks
         })
         
     except Exception as e:
         print(f"Error preparing plot: {e}")
-        requests.post(response_url, json={
+        config.HTTP_SESSION.post(response_url, json={
             "response_type": "ephemeral",
             "text": f"Error preparing plot: {str(e)}"
         })
@@ -882,7 +880,6 @@ def _prepare_plot(query_text: str, response_url: str, payload: Dict[str, Any], p
 
 def _generate_plot(user_id: str, response_url: str, channel_id: str, query_text: str):
     """Generate and upload plot in background thread."""
-    import requests
     import time
     
     try:
@@ -893,78 +890,78 @@ def _generate_plot(user_id: str, response_url: str, channel_id: str, query_text:
         # Rebuild CSV if needed
         if not csv_filepath or not os.path.exists(csv_filepath):
             if query_text:
-                sql_query = LLMService.get_sql_query(query_text, DATABASE_SCHEMA)
+                sql_query = LLMService.get_sql_query(query_text, DatabaseService.get_database_schema())
                 if sql_query:
                     result = DatabaseService.execute_query(sql_query)
                     if "data" in result:
-                        csv_content = DataExportService.generate_csv_from_data(result["data"])
-                        csv_filepath = DataExportService.save_csv_to_storage(csv_content, query_text)
+                        csv_filepath = DataExportService.save_csv_from_data(result["data"], query_text)
                         session_manager.store_user_selection(user_id, "CSV", csv_filepath)
         
         if not csv_filepath or not os.path.exists(csv_filepath):
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "text": "CSV not found for plotting. Please try the Plot Data button again."
             })
             return
         
         if not x_axis or not y_axis:
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "text": "Please select both X and Y axes first."
             })
             return
         
-        # Create plot based on type
+        # Create plot based on type; the PNG goes straight to Slack, so keep it in memory
         if plot_type == "line":
-            plot_filepath = DataExportService.create_line_plot(csv_filepath, x_axis, y_axis, user_id)
+            plot_png = DataExportService.create_line_plot(csv_filepath, x_axis, y_axis, user_id, as_bytes=True)
         elif plot_type == "pie":
-            plot_filepath = DataExportService.create_pie_chart(csv_filepath, x_axis, y_axis, user_id)
+            plot_png = DataExportService.create_pie_chart(csv_filepath, x_axis, y_axis, user_id, as_bytes=True)
         else:  # bar
-            plot_filepath = DataExportService.create_bar_plot(csv_filepath, x_axis, y_axis, user_id)
+            plot_png = DataExportService.create_bar_plot(csv_filepath, x_axis, y_axis, user_id, as_bytes=True)
         
-        if not plot_filepath:
-            requests.post(response_url, json={
+        if not plot_png:
+            config.HTTP_SESSION.post(response_url, json={
                 "text": "Failed to create plot. Please check your axis selections."
             })
             return
         
-        # Upload plot to Slack
-        with open(plot_filepath, "rb") as f:
-            success, response = SlackService.upload_file(
-                channel_id,
-                f.read(),
-                filename=f"plot_{int(time.time())}.png",
-                title="Data Plot",
-                initial_comment=f"Plot of *{y_axis}* by *{x_axis}*"
-            )
+        # Upload plot to Slack off the render pool
+        UPLOAD_EXECUTOR.submit(_upload_plot, response_url, channel_id, plot_png, x_axis, y_axis)
+            
+    except Exception as e:
+        print(f"Error generating plot: {e}")
+        config.HTTP_SESSION.post(response_url, json={"text": f"Error generating plot: {str(e)}"})
+
+
+def _upload_plot(response_url: str, channel_id: str, plot_png: bytes, x_axis: str, y_axis: str):
+    """Upload a rendered plot to Slack in background thread."""
+    try:
+        success, response = SlackService.upload_file(
+            channel_id,
+            plot_png,
+            filename=f"plot_{int(time.time())}.png",
+            title="Data Plot",
+            initial_comment=f"Plot of *{y_axis}* by *{x_axis}*"
+        )
         
         if success:
-            requests.post(response_url, json={"text": "Plot uploaded successfully ✅"})
+            config.HTTP_SESSION.post(response_url, json={"text": "Plot uploaded successfully ✅"})
         else:
-            requests.post(response_url, json={"text": f"Failed to upload plot: {response}"})
-            
-        # Clean up
-        try:
-            os.remove(plot_filepath)
-        except:
-            pass
+            config.HTTP_SESSION.post(response_url, json={"text": f"Failed to upload plot: {response}"})
             
     except Exception as e:
-        print(f"Error generating plot: {e}")
-        requests.post(response_url, json={"text": f"Error generating plot: {str(e)}"})
+        print(f"Error uploading plot: {e}")
+        config.HTTP_SESSION.post(response_url, json={"text": f"Error uploading plot: {str(e)}"})
 
 
 def _generate_insights(query_text: str, response_url: str, payload: Dict[str, Any]):
     """Generate data insights in background thread."""
-    import requests
-    
     try:
         # Try to get SQL from original message, otherwise regenerate
         sql_query = extract_sql_from_slack_message(payload)
         if not sql_query:
-            sql_query = LLMService.get_sql_query(query_text, DATABASE_SCHEMA)
+            sql_query = LLMService.get_sql_query(query_text, DatabaseService.get_database_schema())
         
         if not sql_query:
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": "Could not generate SQL for insights analysis."
             })
@@ -973,7 +970,7 @@ def _generate_insights(query_text: str, response_url: str, payload: Dict[str, An
         # Execute query to get fresh data
         result = DatabaseService.execute_query(sql_query)
         if "error" in result:
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": f"SQL error during insights generation: {result['error']}"
             })
@@ -981,17 +978,17 @@ def _generate_insights(query_text: str, response_url: str, payload: Dict[str, An
         
         data = result["data"]
         if not data:
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": "No data available for insights analysis."
             })
             return
         
         # Generate insights using LLM
-        insights = LLMService.generate_insights(query_text, sql_query, data, DATABASE_SCHEMA)
+        insights = LLMService.generate_insights(query_text, sql_query, data, DatabaseService.get_database_schema())
         
         if not insights:
-            requests.post(response_url, json={
+            config.HTTP_SESSION.post(response_url, json={
                 "response_type": "ephemeral",
                 "text": "Could not generate insights. Please try again or rephrase your question."
             })
@@ -1012,11 +1009,11 @@ def _generate_insights(query_text: str, response_url: str, payload: Dict[str, An
             }]
         }
         
-        requests.post(response_url, json=insights_message)
+        config.HTTP_SESSION.post(response_url, json=insights_message)
         
     except Exception as e:
         print(f"Error generating insights: {e}")
-        requests.post(response_url, json={
+        config.HTTP_SESSION.post(response_url, json={
             "response_type": "ephemeral",
             "text": f"Error generating insights: {str(e)}"
         })
@@ -1024,8 +1021,6 @@ def _generate_insights(query_text: str, response_url: str, payload: Dict[str, An
 
 def _process_datastory_creation(story_request: QueryRequest):
     """Process data story creation in background thread."""
-    import requests
-    
     try:
         print(f"[DEBUG] Processing datastory: '{story_request.question}' for user {story_request.user_id}")
         print(f"[DEBUG] Response URL: {story_request.response_url}")
@@ -1044,7 +1039,7 @@ def _process_datastory_creation(story_request: QueryRequest):
                 "response_type": "in_channel",
                 "text": f"❌ **Data Story Creation Failed**\n\nI encountered an error while creating your data story: *{story_request.question}*\n\nError: {story_result['error']}\n\nPlease try rephrasing your question or use `/dd` for direct queries."
             }
-            response = requests.post(story_request.response_url, json=error_response, timeout=10)
+            response = config.HTTP_SESSION.post(story_request.response_url, json=error_response, timeout=10)
             print(f"[DEBUG] Error response status: {response.status_code}")
             return
         
@@ -1060,13 +1055,23 @@ def _process_datastory_creation(story_request: QueryRequest):
             "text": formatted_story
         }
         
+        # Upload visualization if generated; the three-step file upload runs
+        # alongside the story text post instead of after it
+        upload_thread = None
+        if story_result.get("image_path") and story_request.channel_id:
+            upload_thread = threading.Thread(
+                target=_upload_datastory_visualization,
+                args=(story_result, story_request),
+                daemon=True
+            )
+            upload_thread.start()
+        
         print(f"[DEBUG] Posting story text to: {story_request.response_url}")
-        response = requests.post(story_request.response_url, json=story_message, timeout=10)
+        response = config.HTTP_SESSION.post(story_request.response_url, json=story_message, timeout=10)
         print(f"[DEBUG] Story text response status: {response.status_code}")
         
-        # Upload visualization if generated
-        if story_result.get("image_path") and story_request.channel_id:
-            _upload_datastory_visualization(story_result, story_request)
+        if upload_thread:
+            upload_thread.join()
             
     except Exception as e:
         print(f"Error processing datastory: {e}")
@@ -1078,7 +1083,7 @@ def _process_datastory_creation(story_request: QueryRequest):
                 "response_type": "in_channel",
                 "text": f"❌ **Data Story Creation Failed**\n\nI encountered an unexpected error while creating your data story: *{story_request.question}*\n\nError: {str(e)}\n\nPlease try again or contact support."
             }
-            response = requests.post(story_request.response_url, json=error_response, timeout=10)
+            response = config.HTTP_SESSION.post(story_request.response_url, json=error_response, timeout=10)
             print(f"[DEBUG] Exception response status: {response.status_code}")
         except Exception as post_error:
             print(f"Failed to post datastory error response: {post_error}")
@@ -1125,7 +1130,7 @@ def _upload_datastory_visualization(story_result: Dict[str, Any], story_request:
         with open(image_path, "rb") as f:
             success, response = SlackService.upload_file(
                 story_request.channel_id,
-                f.read(),
+                f,
                 filename=f"datastory_{int(time.time())}.png",
                 title="AI Data Story Visualization",
                 initial_comment=f"🎨 **AI-Generated Whiteboard Visualization**\nData story for: _{story_request.question}_"
@@ -2,121 +2,432 @@
 Data export and visualization services.
 """
 import os
+import io
+import re
+import csv
 import json
 import time
 import hashlib
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.style as mplstyle
-import seaborn as sns
-from typing import Optional, List, Tuple
+import secrets
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import NamedTuple, Optional, List, Tuple, Union
 from config.settings import config
 
-# Set professional plotting style
-plt.style.use('default')
-sns.set_palette("husl")
-
-def apply_professional_style():
-    """Apply professional styling to matplotlib plots."""
-    plt.rcParams.update({
-        # Figure and DPI
-        'figure.figsize': (12, 7),
-        'figure.dpi': 100,
-        'savefig.dpi': 300,
-        'savefig.bbox': 'tight',
-        'savefig.facecolor': 'white',
-        
-        # Font settings
-        'font.family': ['DejaVu Sans', 'Arial', 'sans-serif'],
-        'font.size': 11,
-        'axes.titlesize': 16,
-        'axes.labelsize': 12,
-        'xtick.labelsize': 10,
-        'ytick.labelsize': 10,
-        'legend.fontsize': 10,
-        
-        # Colors and style
-        'axes.facecolor': '#f8f9fa',
-        'figure.facecolor': 'white',
-        'axes.edgecolor': '#dee2e6',
-        'axes.linewidth': 0.8,
-        'axes.spines.top': False,
-        'axes.spines.right': False,
-        'axes.spines.left': True,
-        'axes.spines.bottom': True,
-        
-        # Grid
-        'axes.grid': True,
-        'grid.color': '#e9ecef',
-        'grid.linestyle': '-',
-        'grid.linewidth': 0.5,
-        'axes.axisbelow': True,
-        
-        # Ticks
-        'xtick.color': '#6c757d',
-        'ytick.color': '#6c757d',
-        'xtick.direction': 'out',
-        'ytick.direction': 'out',
+# Result sets larger than this are written through pyarrow (when installed) instead of csv.DictWriter
+ARROW_CSV_THRESHOLD = 10000
+
+# Bar plots show at most this many bars: the largest MAX_BARS - 1 plus an "Other" bar
+MAX_BARS = 50
+
+# Value labels are drawn only up to this many bars; past it they overlap
+MAX_LABELED_BARS = 25
+
+
+@lru_cache(maxsize=1)
+def _load_arrow_csv():
+    """
+    Import pyarrow's CSV module on first use, or return None if pyarrow isn't installed.
+    
+    Arrow encodes large results in parallel C++ batches; csv.DictWriter is the fallback.
+    """
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pacsv
+        return pa, pacsv
+    except ImportError:
+        return None
+
+
+@lru_cache(maxsize=1)
+def _load_arrow_parquet():
+    """Import pyarrow's Parquet module on first use, or return None if unavailable."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        return pa, pq
+    except ImportError:
+        return None
+
+
+def _parquet_sibling(csv_filepath: str) -> str:
+    """Typed copy of an export, written next to the CSV when pyarrow is available."""
+    return os.path.splitext(csv_filepath)[0] + ".parquet"
+
+
+def _write_parquet_sibling(csv_filepath: str, data: List[dict]):
+    """Persist rows as zstd Parquet so later re-opens skip CSV tokenizing and type inference."""
+    arrow = _load_arrow_parquet()
+    if arrow is None:
+        return
+    pa, pq = arrow
+    try:
+        pq.write_table(pa.Table.from_pylist(data), _parquet_sibling(csv_filepath),
+                       compression="zstd", compression_level=3)
+    except Exception as e:
+        # The CSV stays authoritative; without a sibling the plots just parse it
+        print(f"Skipping Parquet copy of {csv_filepath}: {e}")
+
+
+def _read_parquet_sibling(csv_filepath: str, version: Tuple[int, int]):
+    """DataFrame from the Parquet sibling if it is at least as new as the CSV, else None."""
+    if _load_arrow_parquet() is None:
+        return None
+    parquet_path = _parquet_sibling(csv_filepath)
+    try:
+        if os.stat(parquet_path).st_mtime_ns < version[0]:
+            return None
+        import pandas as pd
+        return pd.read_parquet(parquet_path, engine="pyarrow")
+    except Exception:
+        return None
+
+
+# Professional plot style, applied once when matplotlib is first loaded
+_PRO_STYLE = {
+    # Figure and DPI
+    'figure.figsize': (12, 7),
+    'figure.dpi': 100,
+    'savefig.dpi': config.PLOT_DPI,
+    'savefig.bbox': 'tight',
+    'savefig.facecolor': 'white',
+    
+    # Font settings
+    'font.family': ['DejaVu Sans', 'Arial', 'sans-serif'],
+    'font.size': 11,
+    'axes.titlesize': 16,
+    'axes.labelsize': 12,
+    'xtick.labelsize': 10,
+    'ytick.labelsize': 10,
+    'legend.fontsize': 10,
+    
+    # Colors and style
+    'axes.facecolor': '#f8f9fa',
+    'figure.facecolor': 'white',
+    'axes.edgecolor': '#dee2e6',
+    'axes.linewidth': 0.8,
+    'axes.spines.top': False,
+    'axes.spines.right': False,
+    'axes.spines.left': True,
+    'axes.spines.bottom': True,
+    
+    # Grid
+    'axes.grid': True,
+    'grid.color': '#e9ecef',
+    'grid.linestyle': '-',
+    'grid.linewidth': 0.5,
+    'axes.axisbelow': True,
+    
+    # Ticks
+    'xtick.color': '#6c757d',
+    'ytick.color': '#6c757d',
+    'xtick.direction': 'out',
+    'ytick.direction': 'out',
+    
+    # Legend
+    'legend.frameon': True,
+    'legend.fancybox': True,
+    'legend.shadow': True,
+    'legend.framealpha': 0.9,
+    'legend.facecolor': 'white',
+    'legend.edgecolor': '#dee2e6',
+}
+
+
+@lru_cache(maxsize=1)
+def _load_plotting():
+    """
+    Import matplotlib and seaborn on first use.
+    
+    CSV export and column listing never touch matplotlib, so workers that
+    don't plot skip loading it entirely. Returns the seaborn module.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.style
+    import seaborn as sns
+    
+    # Set professional plotting style. rcParams are global and every plot shares
+    # them, so they're validated and applied once rather than on each call.
+    matplotlib.style.use('default')
+    sns.set_palette("husl")
+    matplotlib.rcParams.update(_PRO_STYLE)
+    return sns
+
+
+@lru_cache(maxsize=256)
+def _palette(name: str, n: int):
+    """Seaborn palette, built once per (name, size); bar and slice caps keep n small."""
+    return tuple(_load_plotting().color_palette(name, n))
+
+
+# Idle figures keyed by figsize. Routes run each plot on a fresh thread, so a
+# thread-local figure would never be reused; a small shared pool is.
+_FIGURE_POOL = {}
+_FIGURE_POOL_LOCK = threading.Lock()
+_FIGURE_POOL_SIZE = 4
+
+
+def _acquire_figure(figsize: Tuple[int, int]):
+    """Take a cleared figure from the pool (or create one) with a single Axes."""
+    with _FIGURE_POOL_LOCK:
+        idle = _FIGURE_POOL.get(figsize)
+        fig = idle.pop() if idle else None
+    
+    if fig is None:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+    else:
+        fig.clf()
+    return fig, fig.subplots()
+
+
+def _release_figure(fig, figsize: Tuple[int, int]):
+    """Return a figure to the pool once it has been saved."""
+    with _FIGURE_POOL_LOCK:
+        idle = _FIGURE_POOL.setdefault(figsize, [])
+        if len(idle) < _FIGURE_POOL_SIZE:
+            idle.append(fig)
+
+
+def _save_png(fig, target):
+    """
+    Write a plot as PNG for Slack, to a path or a binary file object.
+    
+    Previews are shown about 800px wide, so PLOT_DPI defaults to 150. zlib level 3
+    without Pillow's optimize pass is much cheaper than the defaults on flat-colour
+    plots, and the files are barely larger.
+    """
+    fig.savefig(target, format='png', dpi=config.PLOT_DPI, bbox_inches='tight',
+                pil_kwargs={"compress_level": 3, "optimize": False})
+
+
+def _finish_plot(fig, figsize: Tuple[int, int], name: str, as_bytes: bool):
+    """Save a drawn figure, return it to the pool, and return the PNG path or bytes."""
+    try:
+        if as_bytes:
+            # Uploaded straight to Slack; no need to round-trip through EXPORTS_DIR
+            buffer = io.BytesIO()
+            _save_png(fig, buffer)
+            return buffer.getvalue()
         
-        # Legend
-        'legend.frameon': True,
-        'legend.fancybox': True,
-        'legend.shadow': True,
-        'legend.framealpha': 0.9,
-        'legend.facecolor': 'white',
-        'legend.edgecolor': '#dee2e6',
-    })
+        plot_filepath = os.path.join(config.EXPORTS_DIR, f"{name}_{secrets.token_hex(4)}.png")
+        _save_png(fig, plot_filepath)
+        return plot_filepath
+    finally:
+        _release_figure(fig, figsize)
+
+
+def _rotate_xticklabels(ax, rotation: int = 45, ha: str = 'right'):
+    """Object-oriented equivalent of plt.xticks(rotation=..., ha=...)."""
+    for label in ax.get_xticklabels():
+        label.set_rotation(rotation)
+        label.set_ha(ha)
+
+
+def _format_value(value, _pos=None) -> str:
+    """Thousands separators for values >= 1, two decimals below; used for ticks and labels."""
+    return f'{value:,.0f}' if abs(value) >= 1 else f'{value:.2f}'
+
+
+def _number_formatter():
+    """Y-axis formatter with thousands separators."""
+    from matplotlib.ticker import FuncFormatter
+    # One formatter per axis: matplotlib binds formatters to the axis they're set on
+    return FuncFormatter(_format_value)
+
+
+# Parsed exports, path -> (file version, DataFrame), least recently used first.
+# The X/Y/plot-type selection flow hits the same export several times.
+# Freshly saved exports are seeded with their source rows (a list of dicts),
+# which are turned into a DataFrame on first use instead of parsing the CSV.
+_CSV_CACHE_SIZE = 64
+_csv_cache = OrderedDict()
+_csv_cache_lock = threading.Lock()
+
+
+def _file_version(csv_filepath: str) -> Tuple[int, int]:
+    """(mtime_ns, size) so an export re-saved under the same name is re-parsed."""
+    stat = os.stat(csv_filepath)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _cached_frame(csv_filepath: str, version: Tuple[int, int]):
+    """Cached DataFrame for this file version, or None."""
+    with _csv_cache_lock:
+        entry = _csv_cache.get(csv_filepath)
+        if entry is None or entry[0] != version:
+            return None
+        _csv_cache.move_to_end(csv_filepath)
+        return entry[1]
+
+
+def _cache_frame(csv_filepath: str, version: Tuple[int, int], df):
+    with _csv_cache_lock:
+        _csv_cache[csv_filepath] = (version, df)
+        _csv_cache.move_to_end(csv_filepath)
+        while len(_csv_cache) > _CSV_CACHE_SIZE:
+            _csv_cache.popitem(last=False)
+
+
+def clear_csv_cache():
+    """Drop all cached DataFrames."""
+    with _csv_cache_lock:
+        _csv_cache.clear()
+
+
+def _export_path(query_identifier: str) -> str:
+    """Stable export path for a query, so re-running it overwrites the same file."""
+    filename_hash = hashlib.blake2b(query_identifier.encode(), digest_size=16).hexdigest()
+    return os.path.join(config.EXPORTS_DIR, f"{filename_hash}.csv")
+
+
+def _remember_export(csv_filepath: str, data: List[dict]):
+    """Seed the cache with the rows just written, plus a Parquet copy if available."""
+    _write_parquet_sibling(csv_filepath, data)
+    _cache_frame(csv_filepath, _file_version(csv_filepath), data)
+
+
+def load_csv(csv_filepath: str, columns: Optional[List[str]] = None):
+    """
+    Return a private copy of the parsed CSV, reusing earlier parses of the same file.
+    
+    Cached frames are shared; callers get a copy and may modify it freely. With
+    `columns`, only those columns (the ones that exist) are copied.
+    """
+    import pandas as pd
+    version = _file_version(csv_filepath)
+    df = _cached_frame(csv_filepath, version)
+    if df is None:
+        df = _read_parquet_sibling(csv_filepath, version)
+        if df is None:
+            df = pd.read_csv(csv_filepath)
+        _cache_frame(csv_filepath, version, df)
+    elif isinstance(df, list):
+        df = pd.DataFrame(df)
+        _cache_frame(csv_filepath, version, df)
+    if columns is not None:
+        df = df[[c for c in dict.fromkeys(columns) if c in df.columns]]
+    return df.copy()
+
+
+def _to_numeric(values):
+    """Numeric version of a column; already-numeric dtypes skip the per-cell coercion."""
+    import pandas as pd
+    if pd.api.types.is_numeric_dtype(values):
+        return values
+    return pd.to_numeric(values, errors='coerce')
+
+
+# Leading date shapes: 2023-01-31, 2023/1/31, 2023-01, 31/01/2023, 1-31-23
+_DATE_LIKE_RE = re.compile(r"\d{4}[-/]\d{1,2}(?:[-/]\d{1,2})?|\d{1,2}[-/]\d{1,2}[-/]\d{2,4}")
+_DATE_SAMPLE_SIZE = 20
+_DATE_MATCH_RATIO = 0.8
+
+
+def _parse_datetimes(values):
+    """
+    Parse a column as datetimes if it looks like one, else return None.
+    
+    Up to 20 non-null values are checked against _DATE_LIKE_RE first, so
+    names, ids and plain numbers never reach pd.to_datetime. The format is
+    guessed once from the first value and passed explicitly.
+    """
+    import pandas as pd
+    from pandas.tseries.api import guess_datetime_format
+    
+    sample = values.dropna().head(_DATE_SAMPLE_SIZE).astype(str)
+    if sample.empty:
+        return None
+    matches = sum(1 for value in sample if _DATE_LIKE_RE.match(value.strip()))
+    if matches < _DATE_MATCH_RATIO * len(sample):
+        return None
+    
+    try:
+        return pd.to_datetime(values, format=guess_datetime_format(sample.iloc[0].strip()))
+    except (ValueError, TypeError):
+        return None
 
 
 class DataExportService:
     """Handles CSV generation and chart creation."""
     
     @staticmethod
-    def generate_csv_from_data(data: List[dict]) -> str:
+    def save_csv_from_data(data: List[dict], query_identifier: str) -> Optional[str]:
         """
-        Generate CSV content from query results.
+        Stream query results straight into a CSV file in storage.
+        
+        Large results are written by pyarrow's multithreaded CSV writer when
+        available; otherwise rows go through csv.DictWriter into a 1 MB write
+        buffer, so the whole CSV is never built as one string. The rows are
+        also kept for plots and column listing (see _remember_export).
         
         Args:
             data: List of dictionaries representing query results
+            query_identifier: Identifier for the query (used in filename)
             
         Returns:
-            CSV content as string
+            Path to saved CSV file, or None if there is no data
         """
         if not data:
-            return ""
-            
+            return None
+        
+        filepath = _export_path(query_identifier)
+        
         try:
-            df = pd.DataFrame(data)
-            return df.to_csv(index=False)
+            arrow = _load_arrow_csv() if len(data) > ARROW_CSV_THRESHOLD else None
+            if arrow is not None:
+                pa, pacsv = arrow
+                try:
+                    pacsv.write_csv(
+                        pa.Table.from_pylist(data), filepath,
+                        write_options=pacsv.WriteOptions(batch_size=8192, quoting_style="needed")
+                    )
+                    _remember_export(filepath, data)
+                    return filepath
+                except (pa.ArrowException, ValueError, TypeError) as e:
+                    # Mixed-type columns can't be typed by Arrow; DictWriter rewrites the file
+                    print(f"Arrow CSV writer failed, falling back to csv: {e}")
+            
+            with open(filepath, "w", encoding="utf-8", newline="", buffering=1 << 20) as f:
+                writer = csv.DictWriter(f, fieldnames=list(data[0].keys()), lineterminator="\n")
+                writer.writeheader()
+                writer.writerows(data)
+            _remember_export(filepath, data)
+            return filepath
         except Exception as e:
-            print(f"Error generating CSV: {e}")
-            return ""
+            print(f"Error saving CSV: {e}")
+            raise
     
     @staticmethod
-    def save_csv_to_storage(csv_content: str, query_identifier: str) -> str:
+    def cleanup_exports(max_age_seconds: float) -> int:
         """
-        Save CSV content to storage and return file path.
+        Delete files in EXPORTS_DIR older than max_age_seconds.
         
         Args:
-            csv_content: CSV content as string
-            query_identifier: Identifier for the query (used in filename)
+            max_age_seconds: Age after which an export is removed
             
         Returns:
-            Path to saved CSV file
+            Number of files removed
         """
-        filename_hash = hashlib.md5(query_identifier.encode()).hexdigest()
-        filename = f"{filename_hash}.csv"
-        filepath = os.path.join(config.EXPORTS_DIR, filename)
-        
+        cutoff = time.time() - max_age_seconds
+        removed = 0
         try:
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(csv_content)
-            return filepath
-        except Exception as e:
-            print(f"Error saving CSV: {e}")
-            raise
+            entries = list(os.scandir(config.EXPORTS_DIR))
+        except FileNotFoundError:
+            return 0
+        
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError as e:
+                print(f"Error removing old export {entry.path}: {e}")
+        return removed
     
     @staticmethod
     def get_csv_columns(csv_filepath: str) -> List[str]:
@@ -130,15 +441,23 @@ class DataExportService:
             List of column names
         """
         try:
-            df = pd.read_csv(csv_filepath)
-            return list(df.columns)
+            # Rows or a parsed frame are already cached: answer from memory
+            df = _cached_frame(csv_filepath, _file_version(csv_filepath))
+            if isinstance(df, list):
+                return list(df[0].keys())
+            if df is not None:
+                return list(df.columns)
+            
+            # Only the header row is needed; don't parse the data rows
+            with open(csv_filepath, newline='', encoding='utf-8') as f:
+                return next(csv.reader(f), [])
         except Exception as e:
             print(f"Error reading CSV columns from {csv_filepath}: {e}")
             return []
     
     @staticmethod
     def create_bar_plot(csv_filepath: str, x_column: str, y_column: str, 
-                       user_id: str) -> Optional[str]:
+                       user_id: str, as_bytes: bool = False) -> Optional[Union[str, bytes]]:
         """
         Create a bar plot from CSV data and save to file.
         
@@ -147,42 +466,51 @@ class DataExportService:
             x_column: Column name for X-axis
             y_column: Column name for Y-axis
             user_id: User ID for unique filename
+            as_bytes: Return the PNG bytes instead of writing to EXPORTS_DIR
             
         Returns:
-            Path to saved plot image or None if failed
+            Path to saved plot image (or PNG bytes if as_bytes) or None if failed
         """
         try:
-            df = pd.read_csv(csv_filepath)
+            import numpy as np
+            import pandas as pd
+            _load_plotting()
+            df = load_csv(csv_filepath, [x_column, y_column])
             
             if df.empty or x_column not in df.columns or y_column not in df.columns:
                 print(f"Invalid columns or empty data: {x_column}, {y_column}")
                 return None
             
-            # Aggregate duplicate X values by summing Y values
-            if df.duplicated(subset=[x_column]).any():
-                df = df.groupby(x_column, dropna=False)[y_column].sum().reset_index()
+            # Aggregate duplicate X values by summing Y values. Converting first keeps
+            # the groupby on a numeric column; without duplicates it's a no-op.
+            df[y_column] = _to_numeric(df[y_column])
+            if x_column != y_column:
+                df = df.groupby(x_column, dropna=False, sort=False, observed=True)[y_column].sum(min_count=1).reset_index()
             
-            # Apply professional styling
-            apply_professional_style()
+            # Past MAX_BARS the plot is unreadable and slow to draw: keep the largest
+            # values (a heap select, not a full sort) and sum the rest into "Other"
+            if len(df) > MAX_BARS:
+                top = df.nlargest(MAX_BARS - 1, y_column)
+                other = df[y_column].drop(top.index).sum()
+                df = pd.concat([top, pd.DataFrame({x_column: ["Other"], y_column: [other]})], ignore_index=True)
             
             # Create plot with enhanced styling
-            fig, ax = plt.subplots(figsize=(12, 7))
+            fig, ax = _acquire_figure((12, 7))
             
             # Convert data
             x_data = df[x_column].astype(str)
-            y_data = pd.to_numeric(df[y_column], errors='coerce')
+            y_data = df[y_column]
             
             # Create bars with gradient colors
-            colors = sns.color_palette("viridis", len(x_data))
+            colors = _palette("viridis", len(x_data))
             bars = ax.bar(x_data, y_data, color=colors, alpha=0.8, edgecolor='white', linewidth=0.7)
             
-            # Add value labels on top of bars
-            for i, (bar, value) in enumerate(zip(bars, y_data)):
-                if not pd.isna(value):
-                    height = bar.get_height()
-                    ax.text(bar.get_x() + bar.get_width()/2., height + height*0.01,
-                           f'{value:,.0f}' if abs(value) >= 1 else f'{value:.2f}',
-                           ha='center', va='bottom', fontweight='bold', fontsize=9)
+            # Add value labels on top of bars in one pass
+            if len(x_data) <= MAX_LABELED_BARS:
+                y_values = y_data.to_numpy(dtype=float, na_value=np.nan)
+                labels = ['' if missing else _format_value(value)
+                          for value, missing in zip(y_values, np.isnan(y_values))]
+                ax.bar_label(bars, labels=labels, fontweight='bold', fontsize=9, padding=3)
             
             # Styling
             ax.set_xlabel(x_column.replace('_', ' ').title(), fontweight='bold')
@@ -191,29 +519,23 @@ class DataExportService:
                         fontweight='bold', pad=20)
             
             # Format x-axis
-            plt.xticks(rotation=45, ha='right')
+            _rotate_xticklabels(ax)
             
             # Add subtle styling touches
-            ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x:,.0f}' if abs(x) >= 1 else f'{x:.2f}'))
+            ax.yaxis.set_major_formatter(_number_formatter())
             
-            plt.tight_layout()
+            fig.tight_layout()
             
             # Save plot
-            plot_filename = f"bar_plot_{user_id}_{int(time.time())}.png"
-            plot_filepath = os.path.join(config.EXPORTS_DIR, plot_filename)
-            plt.savefig(plot_filepath)
-            plt.close()
-            
-            return plot_filepath
+            return _finish_plot(fig, (12, 7), f"bar_plot_{user_id}", as_bytes)
             
         except Exception as e:
             print(f"Error creating bar plot: {e}")
-            plt.close()  # Ensure plot is closed even on error
             return None
     
     @staticmethod
     def create_line_plot(csv_filepath: str, x_column: str, y_column: str, 
-                        user_id: str) -> Optional[str]:
+                        user_id: str, as_bytes: bool = False) -> Optional[Union[str, bytes]]:
         """
         Create a line plot from CSV data and save to file.
         
@@ -222,50 +544,52 @@ class DataExportService:
             x_column: Column name for X-axis
             y_column: Column name for Y-axis
             user_id: User ID for unique filename
+            as_bytes: Return the PNG bytes instead of writing to EXPORTS_DIR
             
         Returns:
-            Path to saved plot image or None if failed
+            Path to saved plot image (or PNG bytes if as_bytes) or None if failed
         """
         try:
-            df = pd.read_csv(csv_filepath)
+            import numpy as np
+            import pandas as pd
+            _load_plotting()
+            df = load_csv(csv_filepath, [x_column, y_column])
             
             if df.empty or x_column not in df.columns or y_column not in df.columns:
                 print(f"Invalid columns or empty data: {x_column}, {y_column}")
                 return None
             
-            # Sort by X column for proper line continuity
-            df = df.sort_values(by=x_column)
-            
-            # Aggregate duplicate X values by averaging Y values (more appropriate for line plots)
-            if df.duplicated(subset=[x_column]).any():
-                df = df.groupby(x_column, dropna=False)[y_column].mean().reset_index()
+            # Aggregate duplicate X values by averaging Y values (more appropriate for line plots).
+            # The groupby sorts X for line continuity; sorting the unique keys is cheaper
+            # than sorting every row first.
+            df[y_column] = _to_numeric(df[y_column])
+            if x_column != y_column:
+                df = df.groupby(x_column, dropna=False, sort=True, observed=True)[y_column].mean().reset_index()
+            else:
+                df = df.sort_values(by=x_column, kind='stable')
             
             # Convert X column to appropriate type for plotting
             x_data = df[x_column]
-            y_data = pd.to_numeric(df[y_column], errors='coerce')
-            
-            # Try to parse X as datetime for better time series plots
-            is_categorical = False
-            try:
-                x_data_parsed = pd.to_datetime(x_data, infer_datetime_format=True)
-                x_for_plot = x_data_parsed
-                x_labels = None  # Use default datetime labels
-            except (ValueError, TypeError):
+            y_data = df[y_column]
+            
+            # Try to parse X as datetime for better time series plots, but only when a
+            # sample looks like dates; categorical columns skip the per-value parse.
+            # x_kind drives tick formatting below: 'datetime', 'numeric' or 'categorical'
+            x_for_plot = _parse_datetimes(x_data)
+            if x_for_plot is not None:
+                x_kind = 'datetime'
+            else:
                 # If not datetime, try numeric
                 try:
                     x_for_plot = pd.to_numeric(x_data, errors='raise')
-                    x_labels = None  # Use numeric values as labels
+                    x_kind = 'numeric'
                 except (ValueError, TypeError):
                     # Use categorical data - plot with indices but keep original labels
                     x_for_plot = range(len(x_data))
-                    x_labels = x_data.astype(str)  # Keep original string labels
-                    is_categorical = True
-            
-            # Apply professional styling
-            apply_professional_style()
+                    x_kind = 'categorical'
             
             # Create plot with enhanced styling
-            fig, ax = plt.subplots(figsize=(12, 7))
+            fig, ax = _acquire_figure((12, 7))
             
             # Enhanced line styling
             line_color = '#2E86AB'  # Professional blue
@@ -284,11 +608,12 @@ class DataExportService:
             
             # Add data point labels (for datasets with <= 10 points)
             if len(y_data) <= 10:
-                for i, (x_val, y_val) in enumerate(zip(x_for_plot, y_data)):
-                    if not pd.isna(y_val):
+                y_values = y_data.to_numpy(dtype=float, na_value=np.nan)
+                for i, (x_val, y_val, missing) in enumerate(zip(x_for_plot, y_values, np.isnan(y_values))):
+                    if not missing:
                         # Use the correct x position for annotation
-                        x_pos = x_val if not is_categorical else i
-                        ax.annotate(f'{y_val:,.0f}' if abs(y_val) >= 1 else f'{y_val:.2f}',
+                        x_pos = x_val if x_kind != 'categorical' else i
+                        ax.annotate(_format_value(y_val),
                                    (x_pos, y_val),
                                    textcoords="offset points",
                                    xytext=(0,10),
@@ -298,17 +623,17 @@ class DataExportService:
                                    bbox=dict(boxstyle='round,pad=0.3', facecolor='white', alpha=0.8))
             
             # Format X-axis based on data type
-            if isinstance(x_for_plot, pd.DatetimeIndex) or hasattr(x_for_plot, 'dt'):
-                plt.xticks(rotation=45, ha='right')
+            if x_kind == 'datetime':
+                _rotate_xticklabels(ax)
                 # Better date formatting
                 fig.autofmt_xdate()
-            elif is_categorical and x_labels is not None:
-                # For categorical data, use original labels with proper positioning
-                ax.set_xticks(range(len(x_labels)))
-                ax.set_xticklabels(x_labels, rotation=45, ha='right')
+            elif x_kind == 'categorical':
+                # Fixed ticks at each index with the original labels; skips the auto-locator
+                ax.set_xticks(range(len(x_data)))
+                ax.set_xticklabels(x_data.astype(str), rotation=45, ha='right')
             else:
                 # For numeric data
-                plt.xticks(rotation=45, ha='right')
+                _rotate_xticklabels(ax)
             
             # Enhanced styling
             ax.set_xlabel(x_column.replace('_', ' ').title(), fontweight='bold')
@@ -317,48 +642,42 @@ class DataExportService:
                         fontweight='bold', pad=20)
             
             # Format y-axis with nice numbers
-            ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x:,.0f}' if abs(x) >= 1 else f'{x:.2f}'))
+            ax.yaxis.set_major_formatter(_number_formatter())
             
             # Add trend line for time series with more than 5 points
             if len(y_data) > 5:
                 try:
-                    if isinstance(x_for_plot, range):
-                        x_numeric = list(x_for_plot)
+                    if x_kind == 'datetime':
+                        # Seconds from the first date; NaT becomes NaN
+                        x_numeric = (x_for_plot - x_for_plot.min()).dt.total_seconds().to_numpy()
+                    elif x_kind == 'numeric':
+                        x_numeric = x_for_plot.to_numpy(dtype=float)
                     else:
-                        x_numeric = pd.to_numeric(pd.Series(x_for_plot), errors='coerce')
-                        if x_numeric.isna().any():
-                            x_numeric = range(len(x_for_plot))
+                        x_numeric = np.arange(len(y_data), dtype=float)
+                    y_numeric = y_data.to_numpy(dtype=float)
                     
-                    # Calculate trend line
-                    z = pd.Series(y_data).dropna()
-                    x_clean = x_numeric[:len(z)]
-                    if len(z) > 1:
-                        coeffs = pd.Series(x_clean).corr(z)
-                        if not pd.isna(coeffs):
-                            trend_y = z.mean() + (pd.Series(x_clean) - pd.Series(x_clean).mean()) * coeffs * (z.std() / pd.Series(x_clean).std())
-                            ax.plot(x_for_plot[:len(trend_y)], trend_y, '--', color='#F18F01', alpha=0.7, linewidth=2, label='Trend')
-                            ax.legend(loc='upper left')
+                    # Least-squares line through the points where both X and Y are present
+                    valid = ~(np.isnan(x_numeric) | np.isnan(y_numeric))
+                    if valid.sum() > 1:
+                        coeffs = np.polyfit(x_numeric[valid], y_numeric[valid], 1)
+                        trend_y = np.polyval(coeffs, x_numeric[valid])
+                        ax.plot(np.asarray(x_for_plot)[valid], trend_y, '--', color='#F18F01', alpha=0.7, linewidth=2, label='Trend')
+                        ax.legend(loc='upper left')
                 except:
                     pass  # Skip trend line if calculation fails
             
-            plt.tight_layout()
+            fig.tight_layout()
             
             # Save plot
-            plot_filename = f"line_plot_{user_id}_{int(time.time())}.png"
-            plot_filepath = os.path.join(config.EXPORTS_DIR, plot_filename)
-            plt.savefig(plot_filepath)
-            plt.close()
-            
-            return plot_filepath
+            return _finish_plot(fig, (12, 7), f"line_plot_{user_id}", as_bytes)
             
         except Exception as e:
             print(f"Error creating line plot: {e}")
-            plt.close()  # Ensure plot is closed even on error
             return None
     
     @staticmethod
     def create_pie_chart(csv_filepath: str, category_column: str, value_column: str, 
-                        user_id: str) -> Optional[str]:
+                        user_id: str, as_bytes: bool = False) -> Optional[Union[str, bytes]]:
         """
         Create a pie chart from CSV data and save to file.
         
@@ -367,24 +686,29 @@ class DataExportService:
             category_column: Column name for category labels (pie slices)
             value_column: Column name for values (slice sizes)
             user_id: User ID for unique filename
+            as_bytes: Return the PNG bytes instead of writing to EXPORTS_DIR
             
         Returns:
-            Path to saved plot image or None if failed
+            Path to saved plot image (or PNG bytes if as_bytes) or None if failed
         """
         try:
-            df = pd.read_csv(csv_filepath)
+            import numpy as np
+            import pandas as pd
+            _load_plotting()
+            df = load_csv(csv_filepath, [category_column, value_column])
             
             if df.empty or category_column not in df.columns or value_column not in df.columns:
                 print(f"Invalid columns or empty data: {category_column}, {value_column}")
                 return None
             
             # Aggregate duplicate categories by summing values
-            if df.duplicated(subset=[category_column]).any():
-                df = df.groupby(category_column, dropna=False)[value_column].sum().reset_index()
+            df[value_column] = _to_numeric(df[value_column])
+            if category_column != value_column:
+                df = df.groupby(category_column, dropna=False, sort=False, observed=True)[value_column].sum(min_count=1).reset_index()
             
             # Convert data
             categories = df[category_column].astype(str)
-            values = pd.to_numeric(df[value_column], errors='coerce')
+            values = df[value_column]
             
             # Remove any NaN values
             valid_mask = ~(values.isna() | (values == 0))
@@ -404,16 +728,13 @@ class DataExportService:
                 categories = list(categories)
                 values = list(values)
             
-            # Apply professional styling
-            apply_professional_style()
-            
             # Create figure with proper sizing for pie chart
-            fig, ax = plt.subplots(figsize=(12, 8))
+            fig, ax = _acquire_figure((12, 8))
             
             # Create a beautiful color palette
-            colors = sns.color_palette("Set3", len(values))
+            colors = _palette("Set3", len(values))
             if len(values) > 10:
-                colors = sns.color_palette("tab20", len(values))
+                colors = _palette("tab20", len(values))
             
             # Create pie chart with enhanced styling
             wedges, texts, autotexts = ax.pie(
@@ -433,24 +754,26 @@ class DataExportService:
                 autotext.set_fontweight('bold')
                 autotext.set_fontsize(9)
             
-            # Add value labels alongside percentages for clarity
-            for i, (category, value) in enumerate(zip(categories, values)):
-                angle = (wedges[i].theta2 + wedges[i].theta1) / 2
-                x = 1.1 * plt.np.cos(plt.np.radians(angle))
-                y = 1.1 * plt.np.sin(plt.np.radians(angle))
+            # Add value labels alongside percentages for clarity. With more than 6
+            # slices the legend below labels them, so skip the extra arrow artists.
+            if len(values) <= 6:
+                thetas = np.radians([(wedge.theta1 + wedge.theta2) * 0.5 for wedge in wedges])
+                xs = 1.1 * np.cos(thetas)
+                ys = 1.1 * np.sin(thetas)
                 
-                # Add value annotation outside the pie
-                ax.annotate(
-                    f'{value:,.0f}' if abs(value) >= 1 else f'{value:.2f}',
-                    xy=(x, y), 
-                    xytext=(x*1.2, y*1.2),
-                    ha='center', 
-                    va='center',
-                    fontsize=8,
-                    fontweight='bold',
-                    bbox=dict(boxstyle='round,pad=0.3', facecolor='white', alpha=0.8, edgecolor='gray'),
-                    arrowprops=dict(arrowstyle='->', color='gray', alpha=0.7)
-                )
+                for x, y, value in zip(xs, ys, values):
+                    # Add value annotation outside the pie
+                    ax.annotate(
+                        _format_value(value),
+                        xy=(x, y), 
+                        xytext=(x*1.2, y*1.2),
+                        ha='center', 
+                        va='center',
+                        fontsize=8,
+                        fontweight='bold',
+                        bbox=dict(boxstyle='round,pad=0.3', facecolor='white', alpha=0.8, edgecolor='gray'),
+                        arrowprops=dict(arrowstyle='->', color='gray', alpha=0.7)
+                    )
             
             # Set title with enhanced styling
             ax.set_title(
@@ -474,51 +797,97 @@ class DataExportService:
                     fontsize=9
                 )
             
-            plt.tight_layout()
+            fig.tight_layout()
             
             # Save plot
-            plot_filename = f"pie_chart_{user_id}_{int(time.time())}.png"
-            plot_filepath = os.path.join(config.EXPORTS_DIR, plot_filename)
-            plt.savefig(plot_filepath, bbox_inches='tight', dpi=300)
-            plt.close()
-            
-            return plot_filepath
+            return _finish_plot(fig, (12, 8), f"pie_chart_{user_id}", as_bytes)
             
         except Exception as e:
             print(f"Error creating pie chart: {e}")
-            plt.close()  # Ensure plot is closed even on error
             return None
 
 
+class UserSelections(NamedTuple):
+    """
+    One user's plot-flow selections.
+    
+    Records are immutable: a store builds a new record and swaps it in with a
+    single dict assignment, so readers never see a half-updated record.
+    """
+    X: Optional[str] = None
+    Y: Optional[str] = None
+    CSV: Optional[str] = None
+    PLOT_TYPE: Optional[str] = None
+    expires_at: float = 0.0
+
+
+SELECTION_TYPES = ("X", "Y", "CSV", "PLOT_TYPE")
+
+
 class SessionManager:
-    """Manages user session data for plotting and exports."""
+    """
+    Manages user session data for plotting and exports.
+    
+    Each user's selections live in one immutable UserSelections record,
+    ordered by last write. A record expires `ttl` seconds after the user's
+    last store, so abandoned plot flows don't accumulate in long-running
+    workers. At most `maxsize` users are kept; the least recently updated
+    are evicted first.
+    
+    Writers serialize on a lock to read-modify-replace the record; reads
+    are a single lock-free dict lookup.
+    """
+    
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
     
-    def __init__(self):
-        self._sessions = {}
+    def _evict(self, now: float):
+        """Drop expired and overflow records; the oldest writes sit at the front."""
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.maxsize and oldest.expires_at > now:
+                break
+            self._sessions.popitem(last=False)
+    
+    def _live_record(self, user_id: str) -> Optional[UserSelections]:
+        """The user's current record, or None if missing or expired."""
+        record = self._sessions.get(user_id)
+        if record is None or record.expires_at <= time.monotonic():
+            return None
+        return record
     
     def store_user_selection(self, user_id: str, selection_type: str, value: str):
-        """Store a user's selection (X axis, Y axis, or CSV path)."""
-        if user_id not in self._sessions:
-            self._sessions[user_id] = {}
-        self._sessions[user_id][selection_type] = value
+        """Store a user's selection (X axis, Y axis, CSV path or plot type); unknown types are ignored."""
+        if selection_type not in SELECTION_TYPES:
+            return
+        with self._lock:
+            now = time.monotonic()
+            record = self._live_record(user_id) or UserSelections()
+            self._sessions[user_id] = record._replace(**{selection_type: value, "expires_at": now + self.ttl})
+            self._sessions.move_to_end(user_id)
+            self._evict(now)
     
     def get_user_selections(self, user_id: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
         """Get user's X axis, Y axis, and CSV path selections."""
-        user_data = self._sessions.get(user_id, {})
-        return (
-            user_data.get("X"),
-            user_data.get("Y"),
-            user_data.get("CSV")
-        )
+        record = self._live_record(user_id)
+        if record is None:
+            return None, None, None
+        return record.X, record.Y, record.CSV
     
     def get_user_selection(self, user_id: str, selection_type: str) -> Optional[str]:
-        """Get a specific user selection."""
-        user_data = self._sessions.get(user_id, {})
-        return user_data.get(selection_type)
+        """Get a specific user selection; None for unknown types."""
+        record = self._live_record(user_id)
+        if record is None or selection_type not in SELECTION_TYPES:
+            return None
+        return getattr(record, selection_type)
     
     def clear_user_session(self, user_id: str):
         """Clear all session data for a user."""
-        self._sessions.pop(user_id, None)
+        with self._lock:
+            self._sessions.pop(user_id, None)
 
 
 # Global session manager instance
@@ -358,7 +358,7 @@ Hand-drawn whiteboard showing "{title}". Simple bar chart with {winner} at {winn
             
             # Save with hashed filename
             timestamp = int(time.time())
-            question_hash = hashlib.md5(question.encode()).hexdigest()[:8]
+            question_hash = hashlib.blake2b(question.encode(), digest_size=4).hexdigest()
             filename = f"datastory_{timestamp}_{question_hash}.png"
             filepath = os.path.join(exports_dir, filename)
             
@@ -4,10 +4,77 @@ Database service for SQLite operations and schema management.
 import sqlite3
 import json
 import os
+import hashlib
+import threading
 import yaml
+from contextlib import contextmanager
 from typing import Optional, List, Dict, Any
 from config.settings import config
 
+# Idle read-only connections per database path. Reusing connections keeps
+# SQLite's page cache warm and lets repeated SQL text hit each connection's
+# prepared-statement cache instead of being re-parsed and re-planned.
+_POOL_SIZE = 4
+_STATEMENT_CACHE_SIZE = 256
+_pools: Dict[str, List[sqlite3.Connection]] = {}
+_pool_lock = threading.Lock()
+
+# Memoized schema summary, keyed on the schema sources and their mtimes
+_schema_cache: Dict[str, Any] = {"key": None, "schema": "", "version": ""}
+_schema_lock = threading.Lock()
+
+
+def _file_mtime(path: Optional[str]) -> Optional[int]:
+    """mtime in ns, or None if the file doesn't exist."""
+    try:
+        return os.stat(path).st_mtime_ns if path else None
+    except OSError:
+        return None
+
+
+def _open_readonly(db_path: str) -> sqlite3.Connection:
+    """Open a read-only connection that may be handed between request threads."""
+    con = sqlite3.connect(
+        f"file:{db_path}?mode=ro",
+        uri=True,
+        check_same_thread=False,
+        cached_statements=_STATEMENT_CACHE_SIZE,
+    )
+    con.row_factory = sqlite3.Row
+    # Read-optimised settings; journal_mode/synchronous don't apply to a read-only handle
+    con.execute(f"PRAGMA cache_size = -{int(config.SQLITE_CACHE_SIZE_KB)}")
+    con.execute(f"PRAGMA mmap_size = {int(config.SQLITE_MMAP_SIZE)}")
+    con.execute("PRAGMA temp_store = MEMORY")
+    con.execute("PRAGMA query_only = 1")
+    return con
+
+
+@contextmanager
+def readonly_connection(db_path: Optional[str] = None):
+    """
+    Borrow a pooled read-only connection for the duration of a `with` block.
+    
+    Each connection is used by one thread at a time and returned afterwards;
+    connections beyond the pool size are closed.
+    """
+    path = db_path or config.SQLITE_PATH
+    with _pool_lock:
+        idle = _pools.get(path)
+        con = idle.pop() if idle else None
+    if con is None:
+        con = _open_readonly(path)
+    
+    try:
+        yield con
+    finally:
+        with _pool_lock:
+            idle = _pools.setdefault(path, [])
+            if len(idle) < _POOL_SIZE:
+                idle.append(con)
+                con = None
+        if con is not None:
+            con.close()
+
 
 class DatabaseService:
     """Handles all database operations and schema management."""
@@ -40,58 +107,114 @@ class DatabaseService:
             return "Database file not found."
         
         try:
-            # Use parameterized connection for safety
-            con = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
-            con.row_factory = sqlite3.Row
-            cur = con.cursor()
+            with readonly_connection(db_path) as con:
+                return DatabaseService._describe_tables(con)
+        except Exception as e:
+            return f"Error reading database schema: {str(e)}"
+    
+    @staticmethod
+    def _describe_tables(con: sqlite3.Connection) -> str:
+        """Describe every user table (columns, PKs, FKs) on an open connection."""
+        cur = con.cursor()
+        
+        # Get all tables (excluding SQLite system tables)
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+        tables = [row["name"] for row in cur.fetchall()]
+        
+        schema_lines = []
+        
+        for table_name in tables:
+            # Get column information
+            # Using ? placeholder to prevent SQL injection
+            cur.execute("SELECT * FROM pragma_table_info(?)", (table_name,))
+            columns = cur.fetchall()
             
-            # Get all tables (excluding SQLite system tables)
-            cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
-            tables = [row["name"] for row in cur.fetchall()]
+            col_descriptions = []
+            for col in columns:
+                name = col["name"]
+                col_type = col["type"]
+                pk_suffix = " PK" if col["pk"] else ""
+                col_descriptions.append(f"{name} {col_type}{pk_suffix}")
             
-            schema_lines = []
+            # Get foreign key information
+            cur.execute("SELECT * FROM pragma_foreign_key_list(?)", (table_name,))
+            foreign_keys = cur.fetchall()
             
-            for table_name in tables:
-                # Get column information
-                # Using ? placeholder to prevent SQL injection
-                cur.execute("SELECT * FROM pragma_table_info(?)", (table_name,))
-                columns = cur.fetchall()
-                
-                col_descriptions = []
-                for col in columns:
-                    name = col["name"]
-                    col_type = col["type"]
-                    pk_suffix = " PK" if col["pk"] else ""
-                    col_descriptions.append(f"{name} {col_type}{pk_suffix}")
-                
-                # Get foreign key information
-                cur.execute("SELECT * FROM pragma_foreign_key_list(?)", (table_name,))
-                foreign_keys = cur.fetchall()
-                
-                fk_descriptions = []
-                for fk in foreign_keys:
-                    fk_descriptions.append(f"{fk['from']} -> {fk['table']}.{fk['to']}")
-                
-                # Build table description
-                table_desc = f"- {table_name}(" + ", ".join(col_descriptions) + ")"
-                if fk_descriptions:
-                    table_desc += " FKs[" + "; ".join(fk_descriptions) + "]"
-                
-                schema_lines.append(table_desc)
+            fk_descriptions = []
+            for fk in foreign_keys:
+                fk_descriptions.append(f"{fk['from']} -> {fk['table']}.{fk['to']}")
             
-            con.close()
-            return "\n".join(schema_lines)
+            # Build table description
+            table_desc = f"- {table_name}(" + ", ".join(col_descriptions) + ")"
+            if fk_descriptions:
+                table_desc += " FKs[" + "; ".join(fk_descriptions) + "]"
             
-        except Exception as e:
-            return f"Error reading database schema: {str(e)}"
+            schema_lines.append(table_desc)
+        
+        return "\n".join(schema_lines)
+
+    @staticmethod
+    def analyze_database(db_path: Optional[str] = None) -> bool:
+        """
+        Refresh SQLite planner statistics with ANALYZE.
+        
+        LLM-generated queries filter on columns nobody anticipated; without
+        sqlite_stat1 the planner guesses and often picks full scans. This is
+        the only write the app makes, so it's opt-in and run once at startup.
+        
+        Returns:
+            True if statistics were refreshed
+        """
+        path = db_path or config.SQLITE_PATH
+        try:
+            con = sqlite3.connect(f"file:{path}?mode=rw", uri=True)
+            try:
+                con.execute("ANALYZE")
+                con.commit()
+            finally:
+                con.close()
+            print(f"[DB] ANALYZE completed for {path}")
+            return True
+        except sqlite3.Error as e:
+            print(f"[DB] ANALYZE skipped for {path}: {e}")
+            return False
     
     @staticmethod
     def get_database_schema() -> str:
-        """Get the database schema from YAML or auto-generate from SQLite."""
-        schema = DatabaseService.load_schema_from_yaml(config.SCHEMA_YAML_PATH)
-        if schema:
-            return schema
-        return DatabaseService.load_schema_from_sqlite(config.SQLITE_PATH)
+        """
+        Get the database schema from YAML or auto-generate from SQLite.
+        
+        The result is memoized and only rebuilt when SCHEMA_YAML_PATH or
+        SQLITE_PATH (or either file's mtime) changes, so callers can ask for
+        it on every request.
+        """
+        return DatabaseService._load_schema()["schema"]
+    
+    @staticmethod
+    def get_schema_version() -> str:
+        """Short hash of the current schema summary, for cache keys."""
+        return DatabaseService._load_schema()["version"]
+    
+    @staticmethod
+    def _load_schema() -> Dict[str, Any]:
+        global _schema_cache
+        key = (
+            config.SCHEMA_YAML_PATH, _file_mtime(config.SCHEMA_YAML_PATH),
+            config.SQLITE_PATH, _file_mtime(config.SQLITE_PATH),
+        )
+        cached = _schema_cache
+        if cached["key"] == key:
+            return cached
+        
+        with _schema_lock:
+            if _schema_cache["key"] != key:
+                schema = DatabaseService.load_schema_from_yaml(config.SCHEMA_YAML_PATH)
+                if not schema:
+                    schema = DatabaseService.load_schema_from_sqlite(config.SQLITE_PATH)
+                version = hashlib.blake2b(schema.encode(), digest_size=8).hexdigest()
+                # Swap in a new dict so lock-free readers never see a half-updated entry
+                _schema_cache = {"key": key, "schema": schema, "version": version}
+            return _schema_cache
     
     @staticmethod
     def explain_query(sql_query: str) -> Dict[str, Any]:
@@ -100,11 +223,8 @@ class DatabaseService:
         Returns {'ok': True} or {'error': '...'}
         """
         try:
-            con = sqlite3.connect(f"file:{config.SQLITE_PATH}?mode=ro", uri=True)
-            cur = con.cursor()
-            cur.execute(f"EXPLAIN QUERY PLAN {sql_query}")
-            _ = cur.fetchall()
-            con.close()
+            with readonly_connection() as con:
+                con.execute(f"EXPLAIN QUERY PLAN {sql_query}").fetchall()
             return {"ok": True}
         except Exception as e:
             return {"error": str(e)}
@@ -121,16 +241,11 @@ class DatabaseService:
             Dictionary with either 'data' (list of dicts) or 'error' key
         """
         try:
-            # Open in read-only mode for safety
-            con = sqlite3.connect(f"file:{config.SQLITE_PATH}?mode=ro", uri=True)
-            con.row_factory = sqlite3.Row
-            cur = con.cursor()
-            
-            cur.execute(sql_query)
-            rows = cur.fetchall()
+            # Pooled connections are opened read-only for safety
+            with readonly_connection() as con:
+                rows = con.execute(sql_query).fetchall()
             result = [dict(row) for row in rows]
             
-            con.close()
             return {"data": result}
             
         except Exception as e:
@@ -1,12 +1,13 @@
 """
 LLM service for generating SQL queries using Ollama or Groq.
 """
+import json
 import requests
-import re
 from typing import Optional
 from config.settings import config
-from core.guardrails import sanitize_sql
+from core.guardrails import is_select_query, sanitize_sql
 from services.database import DatabaseService
+from services.semantic_cache import semantic_cache
 
 # Optional import for Groq support
 try:
@@ -138,9 +139,9 @@ class LLMService:
     
     @staticmethod
     def _call_ollama(prompt: str) -> Optional[str]:
-        """Call Ollama API for LLM generation."""
+        """Call Ollama API for LLM generation, reading the streamed NDJSON reply."""
         try:
-            response = requests.post(
+            with config.HTTP_SESSION.post(
                 f"{config.OLLAMA_BASE_URL}/api/chat",
                 json={
                     "model": config.OLLAMA_MODEL,
@@ -149,19 +150,29 @@ class LLMService:
                         {"role": "user", "content": prompt},
                     ],
                     "options": {"temperature": 0},
-                    "stream": False
+                    "stream": True
                 },
-                timeout=config.LLM_TIMEOUT
-            )
-            
-            response.raise_for_status()
-            data = response.json()
+                timeout=config.LLM_TIMEOUT,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                
+                # One JSON object per line, each carrying the next piece of the message
+                parts = []
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        print(f"Ollama API error: {chunk['error']}")
+                        return None
+                    parts.append((chunk.get("message") or {}).get("content", "") or "")
+                    if chunk.get("done"):
+                        break
             
-            # Extract content from Ollama response
-            content = (data.get("message") or {}).get("content", "") or ""
-            return content.strip()
+            return "".join(parts).strip()
             
-        except requests.RequestException as e:
+        except (requests.RequestException, ValueError) as e:
             print(f"Ollama API error: {e}")
             return None
     
@@ -232,7 +243,50 @@ class LLMService:
         """
         if not question or not schema:
             return None
-            
+
+        use_cache = getattr(config, 'USE_SEMANTIC_CACHE', False)
+        if use_cache:
+            try:
+                cached_sql = semantic_cache.lookup(question, confirm=LLMService._confirm_equivalent_question)
+                if cached_sql:
+                    is_safe, safe_sql, reason = sanitize_sql(cached_sql, config.DEFAULT_LIMIT)
+                    if is_safe:
+                        return safe_sql
+                    print(f"[CACHE] Guardrails rejected cached SQL: {reason}")
+            except Exception as e:
+                print(f"[CACHE] Lookup failed, generating SQL: {e}")
+
+        sql_query = LLMService._generate_sql_query(question, schema, compact_schema)
+
+        if sql_query and use_cache:
+            try:
+                semantic_cache.store(question, sql_query)
+            except Exception as e:
+                print(f"[CACHE] Failed to store generated SQL: {e}")
+
+        return sql_query
+
+    @staticmethod
+    def _confirm_equivalent_question(question: str, cached_question: str, cached_sql: str, signature: str) -> bool:
+        """Ask the LLM whether a cached question/SQL pair answers a new question."""
+        prompt = (
+            "Decide whether two questions about a database ask for exactly the same data "
+            "(same entities, filters, time periods, grouping and limits). "
+            "Answer with only YES or NO.\n\n"
+            f"Question A: {cached_question}\n"
+            f"SQL for A ({signature}):\n{cached_sql}\n\n"
+            f"Question B: {question}\n"
+            "Answer:"
+        )
+        if config.LLM_BACKEND == "groq":
+            answer = LLMService._call_groq(prompt)
+        else:
+            answer = LLMService._call_ollama(prompt)
+        return bool(answer) and answer.strip().upper().startswith("YES")
+
+    @staticmethod
+    def _generate_sql_query(question: str, schema: str, compact_schema: Optional[str] = None) -> Optional[str]:
+        """Generate, guardrail and preflight SQL for a question via the configured LLM."""
         # Optionally use RAG to reduce schema context
         rag_schema = None
         # If a compact_schema is provided by the caller (e.g., /askdb pre-retrieval), use it
@@ -265,11 +319,13 @@ class LLMService:
         try:
             # Clean up the response
             content = content.strip().strip("`")
-            content = re.sub(r"^sql\n", "", content, flags=re.IGNORECASE).strip()
+            if content[:4].lower() == "sql\n":
+                content = content[4:]
+            content = content.strip()
             content = content.rstrip(";").strip()
             
             # Validate it's a SELECT statement
-            if not re.match(r"^\s*(WITH\s+.+?\s+)?SELECT\b", content, re.IGNORECASE | re.DOTALL):
+            if not is_select_query(content):
                 print(f"LLM generated non-SELECT query: {content}")
                 return None
 
@@ -288,7 +344,7 @@ class LLMService:
                 content2 = LLMService._call_groq(repair_prompt) if config.LLM_BACKEND == "groq" else LLMService._call_ollama(repair_prompt)
                 if content2:
                     content2 = content2.strip().strip('`').rstrip(';').strip()
-                    if re.match(r"^\s*(WITH\s+.+?\s+)?SELECT\b", content2, re.IGNORECASE | re.DOTALL):
+                    if is_select_query(content2):
                         content = content2
             
             # Apply guardrails
@@ -305,7 +361,7 @@ class LLMService:
                 if repaired:
                     # Clean and sanitize repaired SQL
                     repaired = repaired.strip().strip('`').rstrip(';').strip()
-                    if re.match(r"^\s*(WITH\s+.+?\s+)?SELECT\b", repaired, re.IGNORECASE | re.DOTALL):
+                    if is_select_query(repaired):
                         ok, safe_repaired, reason2 = sanitize_sql(repaired, config.DEFAULT_LIMIT)
                         if ok:
                             preflight2 = DatabaseService.explain_query(safe_repaired)
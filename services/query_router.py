@@ -15,6 +15,16 @@ class QueryType(Enum):
     AMBIGUOUS = "ambiguous"
 
 
+def _compile(patterns: list) -> list:
+    return [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+
+
+def _keyword_regex(keywords: set) -> re.Pattern:
+    # Longest first so a keyword is never shadowed by a shorter prefix of it
+    alternatives = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternatives})\b")
+
+
 class QueryRouter:
     """
     Intelligent router that determines whether a question needs simple data retrieval
@@ -22,8 +32,8 @@ class QueryRouter:
     """
     
     def __init__(self):
-        # Patterns that indicate simple, direct queries
-        self.simple_patterns = [
+        # Patterns that indicate simple, direct queries (compiled once; routing runs per message)
+        self.simple_patterns = _compile([
             # Direct data requests
             r'\b(show|list|display|get)\s+(?:me\s+)?(the\s+)?',
             r'\btop\s+\d+',
@@ -50,10 +60,10 @@ class QueryRouter:
             
             # Simple comparisons
             r'\bcompare\s+\w+\s+(?:and|vs|versus)\s+\w+',
-        ]
+        ])
         
         # Patterns that indicate complex analytical questions
-        self.complex_patterns = [
+        self.complex_patterns = _compile([
             # Why questions (root cause analysis)
             r'\bwhy\s+(?:did|is|are|has|have)',
             r'\bwhat\s+(?:caused|drove|contributed|led\s+to)',
@@ -91,7 +101,7 @@ class QueryRouter:
             r'\bwhat\s+(?:else|other|more)',
             r'\banything\s+(?:else|interesting|unusual)',
             r'\bsurprising|unexpected|anomal',
-        ]
+        ])
         
         # Keywords that suggest simple queries even if patterns don't match
         self.simple_keywords = {
@@ -105,6 +115,10 @@ class QueryRouter:
             'insight', 'understand', 'explain', 'explore', 'relationship', 'impact',
             'performance', 'optimize', 'strategy', 'improve', 'predict', 'forecast'
         }
+        
+        # Whole-word matchers for the keyword sets, so punctuation ("why?") doesn't hide a keyword
+        self.simple_keywords_re = _keyword_regex(self.simple_keywords)
+        self.complex_keywords_re = _keyword_regex(self.complex_keywords)
     
     def route_question(self, question: str) -> Tuple[QueryType, Dict[str, Any]]:
         """
@@ -116,6 +130,18 @@ class QueryRouter:
         Returns:
             Tuple of (QueryType, routing_metadata)
         """
+        query_type, confidence, reasoning, simple_score, complex_score, question_length = self._route(question)
+        routing_metadata = {
+            'simple_score': simple_score,
+            'complex_score': complex_score,
+            'question_length': question_length,
+            'confidence': confidence,
+            'reasoning': reasoning
+        }
+        return query_type, routing_metadata
+    
+    def _route(self, question: str) -> Tuple[QueryType, float, str, float, float, int]:
+        """Score a question and decide its route; returns a flat tuple, no metadata dict."""
         question_lower = question.lower().strip()
         
         # Calculate pattern scores
@@ -123,8 +149,8 @@ class QueryRouter:
         complex_score = self._calculate_pattern_score(question_lower, self.complex_patterns)
         
         # Calculate keyword scores
-        simple_keyword_score = self._calculate_keyword_score(question_lower, self.simple_keywords)
-        complex_keyword_score = self._calculate_keyword_score(question_lower, self.complex_keywords)
+        simple_keyword_score = self._calculate_keyword_score(question_lower, self.simple_keywords_re)
+        complex_keyword_score = self._calculate_keyword_score(question_lower, self.complex_keywords_re)
         
         # Combine scores
         total_simple_score = simple_score + simple_keyword_score
@@ -135,65 +161,39 @@ class QueryRouter:
         has_question_words = any(word in question_lower for word in ['why', 'how', 'what', 'when', 'where', 'who'])
         
         # Decision logic
-        routing_metadata = {
-            'simple_score': total_simple_score,
-            'complex_score': total_complex_score,
-            'question_length': question_length,
-            'confidence': 0.0,
-            'reasoning': ''
-        }
+        scores = (total_simple_score, total_complex_score, question_length)
         
         # Strong simple indicators
         if total_simple_score >= 3 and total_complex_score <= 1:
-            routing_metadata['confidence'] = 0.9
-            routing_metadata['reasoning'] = 'Strong simple query patterns detected'
-            return QueryType.SIMPLE, routing_metadata
+            return (QueryType.SIMPLE, 0.9, 'Strong simple query patterns detected') + scores
         
         # Strong complex indicators  
         if total_complex_score >= 3 and total_simple_score <= 1:
-            routing_metadata['confidence'] = 0.9
-            routing_metadata['reasoning'] = 'Strong complex analysis patterns detected'
-            return QueryType.COMPLEX, routing_metadata
+            return (QueryType.COMPLEX, 0.9, 'Strong complex analysis patterns detected') + scores
         
         # Length-based heuristics
         if question_length <= 5 and total_simple_score > 0:
-            routing_metadata['confidence'] = 0.8
-            routing_metadata['reasoning'] = 'Short question with simple patterns'
-            return QueryType.SIMPLE, routing_metadata
+            return (QueryType.SIMPLE, 0.8, 'Short question with simple patterns') + scores
         
         if question_length >= 10 and has_question_words:
-            routing_metadata['confidence'] = 0.7
-            routing_metadata['reasoning'] = 'Long analytical question'
-            return QueryType.COMPLEX, routing_metadata
+            return (QueryType.COMPLEX, 0.7, 'Long analytical question') + scores
         
         # Edge case handling
         if total_simple_score > total_complex_score:
-            routing_metadata['confidence'] = 0.6
-            routing_metadata['reasoning'] = 'Simple score higher than complex'
-            return QueryType.SIMPLE, routing_metadata
+            return (QueryType.SIMPLE, 0.6, 'Simple score higher than complex') + scores
         elif total_complex_score > total_simple_score:
-            routing_metadata['confidence'] = 0.6  
-            routing_metadata['reasoning'] = 'Complex score higher than simple'
-            return QueryType.COMPLEX, routing_metadata
+            return (QueryType.COMPLEX, 0.6, 'Complex score higher than simple') + scores
         else:
-            # Ambiguous case
-            routing_metadata['confidence'] = 0.5
-            routing_metadata['reasoning'] = 'Ambiguous question - defaulting to simple'
-            return QueryType.SIMPLE, routing_metadata  # Default to simple for efficiency
+            # Ambiguous case - default to simple for efficiency
+            return (QueryType.SIMPLE, 0.5, 'Ambiguous question - defaulting to simple') + scores
     
     def _calculate_pattern_score(self, question: str, patterns: list) -> float:
         """Calculate score based on regex pattern matches."""
-        score = 0
-        for pattern in patterns:
-            if re.search(pattern, question, re.IGNORECASE):
-                score += 1
-        return score
+        return sum(1 for pattern in patterns if pattern.search(question))
     
-    def _calculate_keyword_score(self, question: str, keywords: set) -> float:
-        """Calculate score based on keyword presence."""
-        question_words = set(question.split())
-        matching_keywords = question_words.intersection(keywords)
-        return len(matching_keywords)
+    def _calculate_keyword_score(self, question: str, keywords_re: re.Pattern) -> float:
+        """Calculate score based on keyword presence (each distinct keyword counts once)."""
+        return len(set(keywords_re.findall(question)))
     
     def should_use_agentic(self, question: str, confidence_threshold: float = 0.7) -> Tuple[bool, str]:
         """
@@ -206,14 +206,14 @@ class QueryRouter:
         Returns:
             Tuple of (use_agentic, explanation)
         """
-        query_type, metadata = self.route_question(question)
+        query_type, confidence = self._route(question)[:2]
         
-        if query_type == QueryType.COMPLEX and metadata['confidence'] >= confidence_threshold:
-            return True, f"Complex analytical question (confidence: {metadata['confidence']:.1%})"
+        if query_type == QueryType.COMPLEX and confidence >= confidence_threshold:
+            return True, f"Complex analytical question (confidence: {confidence:.1%})"
         elif query_type == QueryType.COMPLEX:
-            return True, f"Likely complex question (confidence: {metadata['confidence']:.1%})"
+            return True, f"Likely complex question (confidence: {confidence:.1%})"
         else:
-            return False, f"Simple data query (confidence: {metadata['confidence']:.1%})"
+            return False, f"Simple data query (confidence: {confidence:.1%})"
 
 
 # Global router instance
@@ -0,0 +1,352 @@
+"""
+Semantic NL→SQL cache for CircularQuery.
+
+Previously answered questions are stored with an embedding of the question
+and a structural signature of the SQL that answered them. When a new question
+is close enough to a cached one, the cached SQL is reused and the LLM call is
+skipped entirely.
+
+Decision policy (dual threshold):
+- similarity >= SEMANTIC_CACHE_HIGH → reuse the cached SQL directly
+- SEMANTIC_CACHE_LOW <= similarity < SEMANTIC_CACHE_HIGH → ask the LLM a short
+  yes/no equivalence question before reusing
+- otherwise → miss, generate as usual
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import config
+from services.database import DatabaseService
+
+# Optional import for sentence-transformers embeddings
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+
+_TABLE_RE = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_][\w]*)", re.IGNORECASE)
+_WHERE_RE = re.compile(r"\bWHERE\b(.*?)(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|\bHAVING\b|\bLIMIT\b|$)",
+                       re.IGNORECASE | re.DOTALL)
+_FILTER_COL_RE = re.compile(r"([A-Za-z_][\w.]*)\s*(?:=|<>|!=|<=|>=|<|>|\bLIKE\b|\bIN\b|\bBETWEEN\b|\bIS\b)",
+                            re.IGNORECASE)
+_AGG_RE = re.compile(r"\b(COUNT|SUM|AVG|MIN|MAX)\s*\(", re.IGNORECASE)
+_GROUP_BY_RE = re.compile(r"\bGROUP\s+BY\b", re.IGNORECASE)
+_ORDER_BY_RE = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+
+# Numbers and quoted values in a question ("top 5", "in 2023", "'Red Bull'")
+_LITERAL_RE = re.compile(r"\b\d+(?:\.\d+)?\b|'[^']*'|\"[^\"]*\"")
+# Capitalized words past the first one, usually entities ("drivers from Germany")
+_PROPER_NOUN_RE = re.compile(r"(?<=\s)[A-Z][\w-]*")
+# Words that flip the order or comparison of otherwise identical questions
+_DIRECTION_WORDS = frozenset({
+    "asc", "ascending", "desc", "descending", "top", "bottom", "first", "last",
+    "highest", "lowest", "most", "least", "max", "maximum", "min", "minimum",
+    "best", "worst", "fastest", "slowest", "earliest", "latest", "oldest", "newest",
+    "more", "less", "fewer", "greater", "above", "below", "over", "under",
+    "before", "after", "increasing", "decreasing", "not", "without", "excluding",
+})
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_HASH_DIM = 512
+# How long a computed namespace is reused before the schema files are checked again
+_NAMESPACE_TTL = 5.0
+
+_CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS sql_cache (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    namespace TEXT NOT NULL,
+    question TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    signature TEXT NOT NULL,
+    sql TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    ts REAL NOT NULL
+)
+"""
+
+
+@dataclass
+class QuerySignature:
+    """Structural summary of a generated SQL query."""
+    intent: str = "lookup"
+    tables: List[str] = field(default_factory=list)
+    filter_columns: List[str] = field(default_factory=list)
+    aggregations: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_sql(cls, sql: str) -> "QuerySignature":
+        """Extract a signature from SQL using lightweight regexes."""
+        sql = sql or ""
+        tables = sorted({t.lower() for t in _TABLE_RE.findall(sql)})
+
+        filter_columns: List[str] = []
+        where = _WHERE_RE.search(sql)
+        if where:
+            filter_columns = sorted({c.lower() for c in _FILTER_COL_RE.findall(where.group(1))})
+
+        aggregations = sorted({a.upper() for a in _AGG_RE.findall(sql)})
+
+        if _ORDER_BY_RE.search(sql):
+            intent = "rank"
+        elif aggregations or _GROUP_BY_RE.search(sql):
+            intent = "aggregate"
+        else:
+            intent = "lookup"
+
+        return cls(intent=intent, tables=tables, filter_columns=filter_columns, aggregations=aggregations)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), sort_keys=True)
+
+    def describe(self) -> str:
+        """Human-readable one-liner used in LLM equivalence prompts."""
+        parts = [f"intent={self.intent}", f"tables={','.join(self.tables) or '-'}"]
+        if self.filter_columns:
+            parts.append(f"filters={','.join(self.filter_columns)}")
+        if self.aggregations:
+            parts.append(f"aggregations={','.join(self.aggregations)}")
+        return "; ".join(parts)
+
+
+def _question_literals(question: str) -> frozenset:
+    """Numbers, quoted values, entities and direction words that must match for a cached answer to be reused."""
+    question = (question or "").strip()
+    literals = {m.lower() for m in _LITERAL_RE.findall(question)}
+    literals.update(m.lower() for m in _PROPER_NOUN_RE.findall(question))
+    literals.update(w for w in _WORD_RE.findall(question.lower()) if w in _DIRECTION_WORDS)
+    return frozenset(literals)
+
+
+def _hashing_embedding(text: str) -> np.ndarray:
+    """Dependency-free fallback embedding: hashed word unigrams and bigrams."""
+    vec = np.zeros(_HASH_DIM, dtype=np.float32)
+    words = _WORD_RE.findall((text or "").lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for feat in features:
+        digest = hashlib.blake2b(feat.encode(), digest_size=8).digest()
+        vec[int.from_bytes(digest, "little") % _HASH_DIM] += 1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class SemanticCache:
+    """SQLite-backed cache of question embeddings → generated SQL."""
+
+    def __init__(self, db_path: Optional[str] = None, embedding_fn: Optional[Callable[[str], np.ndarray]] = None):
+        self.db_path = db_path or config.SEMANTIC_CACHE_PATH
+        self.high_threshold = config.SEMANTIC_CACHE_HIGH
+        self.low_threshold = config.SEMANTIC_CACHE_LOW
+        self._embedding_fn = embedding_fn
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._loaded_namespace = None
+        self._namespace_memo: Tuple[float, Optional[str]] = (0.0, None)
+        self._positions: Dict[str, int] = {}
+        self._ids: List[int] = []
+        self._questions: List[str] = []
+        self._sqls: List[str] = []
+        self._signatures: List[str] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def initialize(self):
+        """Create the cache table and load cached vectors for this database and schema."""
+        namespace = self._current_namespace()
+        with self._lock:
+            if self._initialized and self._loaded_namespace == namespace:
+                return
+            # First load, or the schema changed underneath us: start from that namespace's rows
+            self._positions = {}
+            self._ids, self._questions, self._sqls, self._signatures = [], [], [], []
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+            directory = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(directory, exist_ok=True)
+            con = sqlite3.connect(self.db_path)
+            try:
+                con.execute(_CREATE_TABLE_SQL)
+                con.execute("CREATE INDEX IF NOT EXISTS idx_sql_cache_namespace ON sql_cache(namespace)")
+                con.commit()
+                rows = con.execute(
+                    "SELECT id, question, embedding, signature, sql FROM sql_cache WHERE namespace = ? ORDER BY id",
+                    (namespace,)
+                ).fetchall()
+            finally:
+                con.close()
+
+            vectors = []
+            for row_id, question, blob, signature, sql in rows:
+                self._positions[question] = len(self._ids)
+                self._ids.append(row_id)
+                self._questions.append(question)
+                self._signatures.append(signature)
+                self._sqls.append(sql)
+                vectors.append(np.frombuffer(blob, dtype=np.float32))
+            if vectors:
+                self._matrix = np.vstack(vectors)
+            self._initialized = True
+            self._loaded_namespace = namespace
+            print(f"[CACHE] Semantic cache ready with {len(self._ids)} entries ({self.db_path})")
+
+    def lookup(self, question: str,
+               confirm: Optional[Callable[[str, str, str, str], bool]] = None) -> Optional[str]:
+        """
+        Return cached SQL for a semantically equivalent question, or None on miss.
+
+        Args:
+            question: Natural language question
+            confirm: Optional callable(question, cached_question, cached_sql, signature_text) -> bool
+                used for the grey zone between the low and high thresholds
+
+        Returns:
+            Cached SQL string or None
+        """
+        if not question:
+            return None
+        self.initialize()
+        embedding = self._embed(question)
+
+        with self._lock:
+            if not self._ids:
+                return None
+            scores = self._matrix @ embedding
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            row_id = self._ids[best]
+            cached_question = self._questions[best]
+            cached_sql = self._sqls[best]
+            signature = QuerySignature(**json.loads(self._signatures[best]))
+
+        if score < self.low_threshold:
+            return None
+
+        # Never reuse SQL across different numbers, quoted values, entities or directions
+        # ("top 5" vs "top 10", "Germany" vs "France", "ascending" vs "descending")
+        if _question_literals(question) != _question_literals(cached_question):
+            return None
+
+        if score < self.high_threshold:
+            if not confirm or not confirm(question, cached_question, cached_sql, signature.describe()):
+                print(f"[CACHE] Near miss ({score:.3f}) for '{question}' vs '{cached_question}'")
+                return None
+
+        print(f"[CACHE] Hit ({score:.3f}) for '{question}' → cached '{cached_question}'")
+        self._record_hit(row_id)
+        return cached_sql
+
+    def store(self, question: str, sql: str):
+        """Cache the SQL generated for a question, replacing any earlier SQL for the same question."""
+        if not question or not sql:
+            return
+        self.initialize()
+
+        embedding = self._embed(question).astype(np.float32)
+        signature = QuerySignature.from_sql(sql).to_json()
+
+        # The row and the in-memory entry are written together so a namespace switch in
+        # initialize() can't land them in different namespaces
+        with self._lock:
+            position = self._positions.get(question)
+            con = sqlite3.connect(self.db_path)
+            try:
+                if position is not None:
+                    con.execute(
+                        "UPDATE sql_cache SET signature = ?, sql = ?, ts = ? WHERE id = ?",
+                        (signature, sql, time.time(), self._ids[position])
+                    )
+                else:
+                    cur = con.execute(
+                        "INSERT INTO sql_cache (namespace, question, embedding, signature, sql, ts) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (self._loaded_namespace, question, embedding.tobytes(), signature, sql, time.time())
+                    )
+                    row_id = cur.lastrowid
+                con.commit()
+            finally:
+                con.close()
+
+            if position is not None:
+                self._signatures[position] = signature
+                self._sqls[position] = sql
+                return
+
+            self._positions[question] = len(self._ids)
+            self._ids.append(row_id)
+            self._questions.append(question)
+            self._signatures.append(signature)
+            self._sqls.append(sql)
+            if self._matrix.size:
+                self._matrix = np.vstack([self._matrix, embedding])
+            else:
+                self._matrix = embedding.reshape(1, -1)
+
+    def _record_hit(self, row_id: int):
+        try:
+            con = sqlite3.connect(self.db_path)
+            try:
+                con.execute("UPDATE sql_cache SET hits = hits + 1, ts = ? WHERE id = ?", (time.time(), row_id))
+                con.commit()
+            finally:
+                con.close()
+        except sqlite3.Error as e:
+            print(f"[CACHE] Failed to record hit: {e}")
+
+    def _current_namespace(self) -> str:
+        """_namespace(), recomputed at most every _NAMESPACE_TTL seconds."""
+        checked_at, namespace = self._namespace_memo
+        now = time.monotonic()
+        if namespace is None or now - checked_at >= _NAMESPACE_TTL:
+            namespace = self._namespace()
+            self._namespace_memo = (now, namespace)
+        return namespace
+
+    def _namespace(self) -> str:
+        """Cache entries are scoped to the database, its schema version and the embedding model."""
+        if self._embedding_fn is not None:
+            embedder = "custom"
+        elif _get_sentence_model() is not None:
+            embedder = config.SEMANTIC_CACHE_MODEL
+        else:
+            embedder = "hashing"
+        schema_version = DatabaseService.get_schema_version()
+        return f"{os.path.abspath(config.SQLITE_PATH)}|{schema_version}|{embedder}"
+
+    def _embed(self, question: str) -> np.ndarray:
+        if self._embedding_fn is not None:
+            vec = np.asarray(self._embedding_fn(question), dtype=np.float32)
+            norm = np.linalg.norm(vec)
+            return vec / norm if norm else vec
+        return _default_embedding(question)
+
+
+@lru_cache(maxsize=1)
+def _get_sentence_model():
+    if SentenceTransformer is None:
+        return None
+    try:
+        return SentenceTransformer(config.SEMANTIC_CACHE_MODEL)
+    except Exception as e:
+        print(f"[CACHE] Could not load {config.SEMANTIC_CACHE_MODEL}, using hashing embeddings: {e}")
+        return None
+
+
+@lru_cache(maxsize=256)
+def _default_embedding(question: str) -> np.ndarray:
+    """Embed a question once; repeated lookups/stores for the same text are free."""
+    model = _get_sentence_model()
+    if model is None:
+        return _hashing_embedding(question)
+    return np.asarray(model.encode(question, normalize_embeddings=True), dtype=np.float32)
+
+
+# Global cache instance
+semantic_cache = SemanticCache()
@@ -1,14 +1,122 @@
 """
 Slack service for API interactions and file uploads.
 """
-import requests
-from typing import Tuple, Optional, Dict, Any, List
+import io
+import json
+import os
+import threading
+import time
+from typing import IO, Tuple, Optional, Dict, Any, List, Union
+from urllib.parse import urlencode
 from config.settings import config
 
+# Optional: orjson encodes straight to UTF-8 bytes, several times faster than json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# (requests per second, burst) per Slack API method. chat.postMessage is limited
+# per channel; the files.* upload methods are Tier 2 (~20 per minute).
+SLACK_RATE_LIMITS = {
+    "chat.postMessage": (1.0, 3),
+    "files.getUploadURLExternal": (20 / 60, 5),
+    "files.completeUploadExternal": (20 / 60, 5),
+}
+
+# Longest Retry-After we'll honour before giving up on a rate-limited call
+MAX_RETRY_AFTER = 30
+
+
+def _dump_json(payload: Dict[str, Any]) -> bytes:
+    """Encode a request body; callers send it with data= and a JSON Content-Type."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _load_json(content: bytes) -> Any:
+    """Decode a response body."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `capacity`; acquire() blocks for one."""
+    
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class SlackRateLimiter:
+    """One token bucket per Slack API method (and channel, where Slack limits per channel)."""
+    
+    def __init__(self, limits: Dict[str, Tuple[float, int]] = SLACK_RATE_LIMITS,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.limits = limits
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+        self._lock = threading.Lock()
+    
+    def acquire(self, method: str, key: Optional[str] = None):
+        """Block until `method` may be called; methods without a limit pass straight through."""
+        if method not in self.limits:
+            return
+        with self._lock:
+            bucket = self._buckets.get((method, key))
+            if bucket is None:
+                rate, capacity = self.limits[method]
+                bucket = self._buckets[(method, key)] = TokenBucket(rate, capacity, self._clock, self._sleep)
+        bucket.acquire()
+
 
 class SlackService:
     """Handles all Slack API operations."""
     
+    _limiter = SlackRateLimiter()
+    
+    @staticmethod
+    def _api_post(method: str, key: Optional[str] = None, **kwargs):
+        """
+        POST to a Slack API method, paced by the rate limiter.
+        
+        A 429 means Slack rejected the call without processing it, so it is
+        replayed once after the Retry-After delay.
+        """
+        url = f"{config.SLACK_API_BASE}/{method}"
+        SlackService._limiter.acquire(method, key)
+        response = config.HTTP_SESSION.post(url, **kwargs)
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get("Retry-After", 1))
+            except ValueError:
+                retry_after = 1.0
+            if retry_after <= MAX_RETRY_AFTER:
+                print(f"[SLACK] Rate limited on {method}, retrying in {retry_after:g}s")
+                time.sleep(retry_after)
+                response = config.HTTP_SESSION.post(url, **kwargs)
+        return response
+    
     @staticmethod
     def post_message(channel_id: str, text: Optional[str] = None, 
                     blocks: Optional[List[Dict]] = None) -> Tuple[bool, Any]:
@@ -23,30 +131,33 @@ class SlackService:
         Returns:
             Tuple of (success: bool, response: dict or error message)
         """
-        if not config.SLACK_BOT_TOKEN:
+        token = config.SLACK_BOT_TOKEN
+        if not token:
             return False, "SLACK_BOT_TOKEN not configured"
             
         headers = {
             "Content-Type": "application/json",
-            "Authorization": f"Bearer {config.SLACK_BOT_TOKEN}"
+            "Authorization": f"Bearer {token}"
         }
         
+        # Most messages carry blocks; text is usually just the fallback
         payload = {"channel": channel_id}
-        if text:
-            payload["text"] = text
         if blocks:
             payload["blocks"] = blocks
+        if text:
+            payload["text"] = text
             
         try:
-            response = requests.post(
-                f"{config.SLACK_API_BASE}/chat.postMessage",
+            response = SlackService._api_post(
+                "chat.postMessage",
+                channel_id,
                 headers=headers,
-                json=payload,
+                data=_dump_json(payload),
                 timeout=30
             )
             
             if response.ok:
-                return True, response.json()
+                return True, _load_json(response.content)
             else:
                 print(f"Slack post_message error: {response.text}")
                 return False, response.text
@@ -56,7 +167,7 @@ class SlackService:
             return False, str(e)
     
     @staticmethod
-    def upload_file(channel_id: str, file_bytes: bytes, filename: str,
+    def upload_file(channel_id: str, file_source: Union[bytes, IO[bytes]], filename: str,
                    title: Optional[str] = None, 
                    initial_comment: Optional[str] = None) -> Tuple[bool, Any]:
         """
@@ -64,7 +175,7 @@ class SlackService:
         
         Args:
             channel_id: Slack channel ID
-            file_bytes: File content as bytes
+            file_source: File content as bytes, or a binary file object to stream from
             filename: Name for the uploaded file
             title: File title (optional)
             initial_comment: Comment to post with file (optional)
@@ -72,78 +183,103 @@ class SlackService:
         Returns:
             Tuple of (success: bool, response: dict or error message)
         """
-        if not config.SLACK_BOT_TOKEN:
+        token = config.SLACK_BOT_TOKEN
+        if not token:
             return False, "SLACK_BOT_TOKEN not configured"
             
         try:
-            # Step 1: Get upload URL and file ID
-            headers = {"Authorization": f"Bearer {config.SLACK_BOT_TOKEN}"}
-            
-            get_url_response = requests.post(
-                f"{config.SLACK_API_BASE}/files.getUploadURLExternal",
-                headers=headers,
-                data={
-                    "filename": filename,
-                    "length": len(file_bytes),
-                    "token": config.SLACK_BOT_TOKEN,
-                },
-                timeout=30,
+            success, file_id = SlackService._stage_file(token, file_source, filename)
+            if not success:
+                return False, file_id
+            return SlackService._complete_upload(
+                token, channel_id, [{"id": file_id, "title": title or filename}], initial_comment
             )
             
-            if not get_url_response.ok:
-                return False, f"Failed to get upload URL: {get_url_response.text}"
-                
-            url_data = get_url_response.json()
-            if not url_data.get("ok"):
-                return False, f"Slack API error: {url_data}"
-                
-            upload_url = url_data["upload_url"]
-            file_id = url_data["file_id"]
+        except Exception as e:
+            print(f"Slack upload_file exception: {e}")
+            return False, str(e)
+    
+    @staticmethod
+    def _stage_file(token: str, file_source: Union[bytes, IO[bytes]], filename: str) -> Tuple[bool, str]:
+        """Steps 1-2 of the external upload flow; returns (success, file ID or error message)."""
+        # Stream file objects from their current position instead of reading them into memory
+        if isinstance(file_source, (bytes, bytearray)):
+            file_source = io.BytesIO(file_source)
+        try:
+            length = os.fstat(file_source.fileno()).st_size - file_source.tell()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            position = file_source.tell()
+            length = file_source.seek(0, io.SEEK_END) - position
+            file_source.seek(position)
+        
+        # Step 1: Get upload URL and file ID. The form body is encoded once and
+        # reused as-is if a rate-limited call is replayed.
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+        form = urlencode({
+            "filename": filename,
+            "length": length,
+            "token": token,
+        }).encode("ascii")
+        
+        get_url_response = SlackService._api_post(
+            "files.getUploadURLExternal",
+            headers=headers,
+            data=form,
+            timeout=30,
+        )
+        
+        if not get_url_response.ok:
+            return False, f"Failed to get upload URL: {get_url_response.text}"
             
-            # Step 2: Upload file bytes
-            upload_response = requests.post(
-                upload_url,
-                data=file_bytes,
-                headers={"Content-Type": "application/octet-stream"},
-                timeout=60,
-            )
+        url_data = _load_json(get_url_response.content)
+        if not url_data.get("ok"):
+            return False, f"Slack API error: {url_data}"
             
-            if not upload_response.ok:
-                return False, f"File upload failed: {upload_response.text}"
-                
-            # Step 3: Complete upload and share to channel
-            complete_payload = {
-                "files": [
-                    {
-                        "id": file_id,
-                        "title": title or filename,
-                    }
-                ],
-                "channel_id": channel_id,
-            }
+        upload_url = url_data["upload_url"]
+        file_id = url_data["file_id"]
+        
+        # Step 2: Upload file bytes
+        upload_response = config.HTTP_SESSION.post(
+            upload_url,
+            data=file_source,
+            headers={"Content-Type": "application/octet-stream", "Content-Length": str(length)},
+            timeout=60,
+        )
+        
+        if not upload_response.ok:
+            return False, f"File upload failed: {upload_response.text}"
+        return True, file_id
+    
+    @staticmethod
+    def _complete_upload(token: str, channel_id: str, files: List[Dict[str, str]],
+                         initial_comment: Optional[str] = None) -> Tuple[bool, Any]:
+        """Step 3 of the external upload flow: share staged files to the channel."""
+        complete_payload = {
+            "files": files,
+            "channel_id": channel_id,
+        }
+        
+        if initial_comment:
+            complete_payload["initial_comment"] = initial_comment
             
-            if initial_comment:
-                complete_payload["initial_comment"] = initial_comment
-                
-            complete_response = requests.post(
-                f"{config.SLACK_API_BASE}/files.completeUploadExternal",
-                headers={
-                    "Authorization": f"Bearer {config.SLACK_BOT_TOKEN}",
-                    "Content-Type": "application/json; charset=utf-8",
-                },
-                json=complete_payload,
-                timeout=30,
-            )
+        complete_response = SlackService._api_post(
+            "files.completeUploadExternal",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json; charset=utf-8",
+            },
+            data=_dump_json(complete_payload),
+            timeout=30,
+        )
+        
+        if not complete_response.ok:
+            return False, f"Failed to complete upload: {complete_response.text}"
             
-            if not complete_response.ok:
-                return False, f"Failed to complete upload: {complete_response.text}"
-                
-            complete_data = complete_response.json()
-            if not complete_data.get("ok"):
-                return False, f"Complete upload error: {complete_data}"
-                
-            return True, complete_data
+        complete_data = _load_json(complete_response.content)
+        if not complete_data.get("ok"):
+            return False, f"Complete upload error: {complete_data}"
             
-        except Exception as e:
-            print(f"Slack upload_file exception: {e}")
-            return False, str(e)
\ No newline at end of file
+        return True, complete_data
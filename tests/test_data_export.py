@@ -0,0 +1,174 @@
+"""
+Tests for CSV exports and plot-flow sessions.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from services import data_export
+from services.data_export import DataExportService, SessionManager, clear_csv_cache, load_csv
+
+
+class ArrowError(Exception):
+    """Stand-in for pyarrow.ArrowException."""
+
+
+class ExportTestCase(unittest.TestCase):
+    """Exports go to a temporary EXPORTS_DIR with an empty cache and no Parquet copies."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        patches = [
+            mock.patch("services.data_export.config.EXPORTS_DIR", self.tmp_dir),
+            mock.patch("services.data_export._load_arrow_parquet", return_value=None),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        clear_csv_cache()
+
+    def tearDown(self):
+        clear_csv_cache()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _fake_arrow(self, write_csv=None):
+        """(pa, pacsv) mocks; write_csv writes a marker file unless replaced."""
+        pa = mock.Mock(ArrowException=ArrowError)
+        pacsv = mock.Mock()
+
+        def write(table, path, write_options=None):
+            with open(path, "w") as f:
+                f.write("arrow\n")
+
+        pacsv.write_csv.side_effect = write_csv or write
+        return pa, pacsv
+
+
+class TestSaveCsv(ExportTestCase):
+    """Test cases for the DictWriter/Arrow switch in save_csv_from_data."""
+
+    ROWS = [{"name": "Hamilton", "wins": 103}, {"name": "Lauda", "wins": 25}, {"name": "Prost", "wins": 51}]
+
+    def test_small_results_use_dictwriter(self):
+        """Test results at or below ARROW_CSV_THRESHOLD never load pyarrow."""
+        with mock.patch.object(data_export, "ARROW_CSV_THRESHOLD", 3), \
+                mock.patch("services.data_export._load_arrow_csv") as load_arrow:
+            path = DataExportService.save_csv_from_data(self.ROWS, "q1")
+
+        load_arrow.assert_not_called()
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "name,wins\nHamilton,103\nLauda,25\nProst,51\n")
+
+    def test_large_results_use_arrow(self):
+        """Test results over ARROW_CSV_THRESHOLD go through pyarrow's writer."""
+        pa, pacsv = self._fake_arrow()
+        with mock.patch.object(data_export, "ARROW_CSV_THRESHOLD", 2), \
+                mock.patch("services.data_export._load_arrow_csv", return_value=(pa, pacsv)):
+            path = DataExportService.save_csv_from_data(self.ROWS, "q1")
+
+        pa.Table.from_pylist.assert_called_once_with(self.ROWS)
+        pacsv.write_csv.assert_called_once()
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "arrow\n")
+
+    def test_arrow_failure_falls_back_to_dictwriter(self):
+        """Test an Arrow typing error rewrites the file with csv.DictWriter."""
+        pa, pacsv = self._fake_arrow(write_csv=ArrowError("mixed types"))
+        with mock.patch.object(data_export, "ARROW_CSV_THRESHOLD", 2), \
+                mock.patch("services.data_export._load_arrow_csv", return_value=(pa, pacsv)):
+            path = DataExportService.save_csv_from_data(self.ROWS, "q1")
+
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.readline(), "name,wins\n")
+
+    def test_no_data(self):
+        """Test empty results don't create a file."""
+        self.assertIsNone(DataExportService.save_csv_from_data([], "q1"))
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+
+class TestExportCache(ExportTestCase):
+    """Test cases for the parsed-export cache behind load_csv and get_csv_columns."""
+
+    def _rewrite(self, path, text):
+        """Overwrite an export with different content, as a re-run query would."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_columns_from_cache_then_file(self):
+        """Test columns come from the cached rows until the file changes."""
+        path = DataExportService.save_csv_from_data([{"a": 1, "b": 2}], "q1")
+        self.assertEqual(DataExportService.get_csv_columns(path), ["a", "b"])
+
+        self._rewrite(path, "c,d,e\n1,2,3\n")
+        self.assertEqual(DataExportService.get_csv_columns(path), ["c", "d", "e"])
+
+    def test_load_csv_reparses_new_version(self):
+        """Test a re-saved export is re-parsed instead of served from the cache."""
+        path = DataExportService.save_csv_from_data([{"a": 1, "b": 2}], "q1")
+        self.assertEqual(load_csv(path)["a"].tolist(), [1])
+
+        self._rewrite(path, "a,b\n7,8\n9,10\n")
+        self.assertEqual(load_csv(path)["a"].tolist(), [7, 9])
+
+    def test_load_csv_returns_private_copy(self):
+        """Test callers can modify the frame without touching the cached one."""
+        path = DataExportService.save_csv_from_data([{"a": 1, "b": 2}], "q1")
+        df = load_csv(path, columns=["b", "missing"])
+        self.assertEqual(list(df.columns), ["b"])
+
+        df["b"] = 0
+        self.assertEqual(load_csv(path)["b"].tolist(), [2])
+
+
+class TestPlots(ExportTestCase):
+    """Smoke tests for the plot builders."""
+
+    def setUp(self):
+        super().setUp()
+        try:
+            import matplotlib  # noqa: F401
+        except ImportError:
+            self.skipTest("matplotlib not installed")
+
+    def test_plots_render_png_bytes(self):
+        """Test each plot type renders from a cached export, including the capped bar plot."""
+        rows = [{"team": f"team{i}", "year": f"20{i % 10 + 10}-01-01", "points": i} for i in range(60)]
+        path = DataExportService.save_csv_from_data(rows, "q1")
+
+        for plot, x_column in [
+            (DataExportService.create_bar_plot, "team"),
+            (DataExportService.create_line_plot, "year"),
+            (DataExportService.create_pie_chart, "team"),
+        ]:
+            with self.subTest(plot=plot.__name__):
+                png = plot(path, x_column, "points", "U1", as_bytes=True)
+                self.assertTrue(png.startswith(b"\x89PNG"))
+
+
+class TestSessionManager(unittest.TestCase):
+    """Test cases for SessionManager."""
+
+    def test_selections_round_trip(self):
+        """Test stored selections are returned per user."""
+        sessions = SessionManager()
+        sessions.store_user_selection("U1", "X", "year")
+        sessions.store_user_selection("U1", "CSV", "exports/a.csv")
+
+        self.assertEqual(sessions.get_user_selections("U1"), ("year", None, "exports/a.csv"))
+        self.assertIsNone(sessions.get_user_selection("U2", "X"))
+
+    def test_unknown_selection_type_ignored(self):
+        """Test unknown selection types are a no-op on store and None on get."""
+        sessions = SessionManager()
+        sessions.store_user_selection("U1", "COLOR", "red")
+        sessions.store_user_selection("U1", "X", "year")
+
+        self.assertIsNone(sessions.get_user_selection("U1", "COLOR"))
+        self.assertIsNone(sessions.get_user_selection("U1", "expires_at"))
+        self.assertEqual(sessions.get_user_selection("U1", "X"), "year")
+
+
+if __name__ == '__main__':
+    unittest.main()
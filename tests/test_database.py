@@ -5,7 +5,7 @@ import unittest
 import tempfile
 import sqlite3
 import os
-from services.database import DatabaseService
+from services.database import DatabaseService, readonly_connection
 
 
 class TestDatabaseService(unittest.TestCase):
@@ -108,6 +108,42 @@ class TestDatabaseService(unittest.TestCase):
         finally:
             config.settings.config.SQLITE_PATH = original_sqlite_path
     
+    def test_pooled_connection_reused_and_read_only(self):
+        """Test pooled connections are reused and reject writes."""
+        with readonly_connection(self.test_db_path) as con:
+            first = con
+        
+        with readonly_connection(self.test_db_path) as con:
+            self.assertIs(con, first)
+            with self.assertRaises(sqlite3.OperationalError):
+                con.execute("DELETE FROM users")
+    
+    def test_schema_memoized_until_database_changes(self):
+        """Test schema summary is cached and refreshed when the DB file changes."""
+        import config.settings
+        original_sqlite_path = config.settings.config.SQLITE_PATH
+        original_yaml_path = config.settings.config.SCHEMA_YAML_PATH
+        config.settings.config.SQLITE_PATH = self.test_db_path
+        config.settings.config.SCHEMA_YAML_PATH = ""
+        
+        try:
+            schema = DatabaseService.get_database_schema()
+            version = DatabaseService.get_schema_version()
+            self.assertIs(DatabaseService.get_database_schema(), schema)
+            
+            conn = sqlite3.connect(self.test_db_path)
+            conn.execute("CREATE TABLE products (id INTEGER PRIMARY KEY)")
+            conn.commit()
+            conn.close()
+            os.utime(self.test_db_path, ns=(0, os.stat(self.test_db_path).st_mtime_ns + 1))
+            
+            self.assertIn("products", DatabaseService.get_database_schema())
+            self.assertNotEqual(DatabaseService.get_schema_version(), version)
+            
+        finally:
+            config.settings.config.SQLITE_PATH = original_sqlite_path
+            config.settings.config.SCHEMA_YAML_PATH = original_yaml_path
+    
     def test_load_schema_nonexistent_db(self):
         """Test schema loading from nonexistent database."""
         schema = DatabaseService.load_schema_from_sqlite("/nonexistent/database.db")
@@ -0,0 +1,93 @@
+"""
+Tests for Slack formatting helpers.
+"""
+import unittest
+from unittest import mock
+from utils import formatting
+from utils.formatting import format_data_as_table, parse_page_command, get_cached_page, cache_page
+
+
+class TestFormatDataAsTable(unittest.TestCase):
+    """Test cases for format_data_as_table."""
+
+    def test_empty_data(self):
+        """Test empty results render a placeholder."""
+        self.assertEqual(format_data_as_table([]), "```\n<no rows>\n```")
+
+    def test_columns_are_aligned(self):
+        """Test header, separator and rows are padded to each column's width."""
+        data = [{"name": "Hamilton", "wins": 103}, {"name": "Lauda", "wins": 25}]
+        expected = (
+            "```\n"
+            "name     | wins\n"
+            "---------|-----\n"
+            "Hamilton | 103 \n"
+            "Lauda    | 25  \n"
+            "```"
+        )
+        self.assertEqual(format_data_as_table(data), expected)
+
+    def test_long_values_truncated(self):
+        """Test values over max_width are cut with an ellipsis."""
+        table = format_data_as_table([{"note": "x" * 50}], max_width=10)
+        self.assertIn("xxxxxxx...", table)
+        self.assertNotIn("x" * 11, table)
+
+    def test_cells_cannot_break_table(self):
+        """Test newlines and pipes inside values are neutralised."""
+        table = format_data_as_table([{"a": "one\ntwo", "b": "x|y"}])
+        self.assertIn("one two | x/y", table)
+
+    def test_missing_values(self):
+        """Test NULLs and keys missing from some rows still render."""
+        table = format_data_as_table([{"a": "x", "b": None}, {"a": "y"}])
+        self.assertEqual(table.splitlines()[3:5], ["x | None", "y | None"])
+
+    def test_same_cells_either_side_of_small_table_threshold(self):
+        """Test NULLs and ints render the same with and without the DataFrame path."""
+        rows = [{"id": 1, "wins": None, "name": "Hamilton"}, {"id": 2, "wins": 25}]
+        expected = ["1  | None | Hamilton", "2  | 25   | None    "]
+        for count in (formatting.SMALL_TABLE_ROWS, formatting.SMALL_TABLE_ROWS + 1):
+            with self.subTest(rows=count):
+                data = rows + [{"id": 10, "wins": 7, "name": "x"}] * (count - len(rows))
+                self.assertEqual(format_data_as_table(data).splitlines()[3:5], expected)
+
+
+class TestParsePageCommand(unittest.TestCase):
+    """Test cases for parse_page_command."""
+
+    def test_page_suffix(self):
+        """Test a trailing <N> selects the page and is removed from the query."""
+        self.assertEqual(parse_page_command("top 5 drivers <2>"), ("top 5 drivers", 2))
+        self.assertEqual(parse_page_command("top 5 drivers <2>  "), ("top 5 drivers", 2))
+
+    def test_no_page_suffix(self):
+        """Test commands without a suffix default to page 1."""
+        self.assertEqual(parse_page_command("  top 5 drivers "), ("top 5 drivers", 1))
+
+
+class TestPageCache(unittest.TestCase):
+    """Test cases for the rendered page cache."""
+
+    def tearDown(self):
+        formatting._page_cache.clear()
+
+    def test_cached_page_round_trip(self):
+        """Test a rendered page is returned for the same SQL and page only."""
+        pagination = {"total_pages": 3, "current_page": 2}
+        cache_page("SELECT 1", 2, 12, "table", pagination)
+
+        self.assertEqual(get_cached_page("SELECT 1", 2, 12), ("table", pagination))
+        self.assertIsNone(get_cached_page("SELECT 1", 3, 12))
+        self.assertIsNone(get_cached_page("SELECT 2", 2, 12))
+
+    def test_expired_page_dropped(self):
+        """Test entries past the TTL are treated as misses."""
+        with mock.patch.object(formatting, "PAGE_CACHE_TTL", 0):
+            cache_page("SELECT 1", 1, 12, "table", {})
+        self.assertIsNone(get_cached_page("SELECT 1", 1, 12))
+        self.assertEqual(len(formatting._page_cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
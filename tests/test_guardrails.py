@@ -1,8 +1,9 @@
 """
 Tests for SQL guardrails and security functions.
 """
+import time
 import unittest
-from core.guardrails import sanitize_sql, validate_table_name
+from core.guardrails import is_select_query, sanitize_sql, validate_table_name
 
 
 class TestGuardrails(unittest.TestCase):
@@ -90,6 +91,59 @@ class TestGuardrails(unittest.TestCase):
         self.assertFalse(is_safe)
         self.assertIn("excessive_limit", reason)
     
+    def test_keywords_inside_quotes_allowed(self):
+        """Test that keywords inside literals or quoted identifiers aren't flagged."""
+        queries = [
+            "SELECT * FROM users WHERE note = 'please drop by'",
+            "SELECT * FROM logs WHERE message = 'a; b -- c'",
+            "SELECT \"Update Date\" FROM orders",
+            "SELECT [Drop Date], `it's` FROM orders",
+        ]
+
+        for query in queries:
+            with self.subTest(query=query):
+                is_safe, sanitized, reason = sanitize_sql(query)
+                self.assertTrue(is_safe, f"Query should be safe: {query}. Reason: {reason}")
+                self.assertTrue(sanitized.startswith(query))
+
+    def test_statements_after_literals_rejected(self):
+        """Test that masking quotes doesn't hide SQL outside them."""
+        queries = [
+            "SELECT * FROM users WHERE name = 'x'; DROP TABLE users",
+            "SELECT * FROM users WHERE name = 'it''s' OR 1=1 -- '",
+            "SELECT * FROM users WHERE name = 'unterminated DROP TABLE users",
+            "SELECT [a'b] FROM t; DROP TABLE t; SELECT 'x' FROM t",
+            "SELECT `a'b` FROM t WHERE 1=1; DELETE FROM t; SELECT 'c'",
+        ]
+
+        for query in queries:
+            with self.subTest(query=query):
+                is_safe, _, _ = sanitize_sql(query)
+                self.assertFalse(is_safe, f"Query should be rejected: {query}")
+
+    def test_oversized_sql_rejected(self):
+        """Test that SQL over the length cap is rejected before matching."""
+        query = "SELECT * FROM users WHERE name = '" + "a" * 20000 + "'"
+        is_safe, _, reason = sanitize_sql(query)
+
+        self.assertFalse(is_safe)
+        self.assertEqual(reason, "sql_too_long")
+
+    def test_pathological_input_is_fast(self):
+        """Test that malformed input can't trigger regex backtracking."""
+        pathological_queries = [
+            "WITH " + "a AS (x) " * 1500,
+            "SELECT 1" + ";" * 15000 + "x",
+            "a" + " " * 15000 + "b",
+        ]
+
+        for query in pathological_queries:
+            with self.subTest(query=query[:20]):
+                start = time.perf_counter()
+                is_safe, _, _ = sanitize_sql(query)
+                self.assertFalse(is_safe)
+                self.assertLess(time.perf_counter() - start, 0.5)
+
     def test_table_name_validation(self):
         """Test table name validation."""
         valid_names = [
@@ -121,5 +175,21 @@ class TestGuardrails(unittest.TestCase):
                 self.assertFalse(validate_table_name(name), f"Invalid table name accepted: {name}")
 
 
+class TestSelectCheck(unittest.TestCase):
+    """Test cases for is_select_query."""
+
+    def test_select_and_cte_accepted(self):
+        """Test plain SELECTs and WITH … SELECT CTEs are accepted."""
+        for sql in ["SELECT 1", "  select a from t", "WITH t AS (SELECT 1 AS a) SELECT a FROM t"]:
+            with self.subTest(sql=sql):
+                self.assertTrue(is_select_query(sql))
+
+    def test_non_select_rejected(self):
+        """Test other statements and a bare WITH are rejected."""
+        for sql in ["DELETE FROM t", "WITH  SELECT", "WITH t AS (x)", "WITH t AS (SELECT ') SELECT' FROM x)"]:
+            with self.subTest(sql=sql):
+                self.assertFalse(is_select_query(sql))
+
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,29 @@
+"""
+Tests for LLM SQL generation.
+"""
+import unittest
+from unittest import mock
+from services.llm import LLMService
+
+
+class TestGenerateSqlQuery(unittest.TestCase):
+    """Test cases for the generate → preflight → repair flow."""
+
+    @mock.patch("services.llm.config.LLM_BACKEND", "ollama")
+    @mock.patch("services.llm.DatabaseService.explain_query")
+    @mock.patch.object(LLMService, "_repair_sql")
+    @mock.patch.object(LLMService, "_call_ollama")
+    def test_repaired_cte_is_used(self, call_ollama, repair_sql, explain_query):
+        """Test a repaired query written as a CTE passes the SELECT check."""
+        call_ollama.return_value = "SELECT missing_col FROM drivers"
+        repair_sql.return_value = "WITH t AS (SELECT forename FROM drivers) SELECT forename FROM t"
+        explain_query.side_effect = [{"error": "no such column: missing_col"}, {"ok": True}]
+
+        sql = LLMService._generate_sql_query("list driver first names", "drivers(forename)")
+
+        self.assertIsNotNone(sql)
+        self.assertTrue(sql.startswith("WITH t AS (SELECT forename FROM drivers) SELECT forename FROM t"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Tests for the query router.
+"""
+import unittest
+from services.query_router import QueryRouter, QueryType
+
+
+class TestQueryRouter(unittest.TestCase):
+    """Test cases for QueryRouter."""
+
+    def setUp(self):
+        self.router = QueryRouter()
+
+    def test_simple_questions(self):
+        """Test direct data requests are routed to the simple path."""
+        questions = [
+            "show me the top 10 customers",
+            "how many orders",
+            "list all products",
+            "sum of sales by region",
+        ]
+
+        for question in questions:
+            with self.subTest(question=question):
+                query_type, _ = self.router.route_question(question)
+                self.assertEqual(query_type, QueryType.SIMPLE)
+
+    def test_complex_questions(self):
+        """Test analytical questions are routed to the agentic path."""
+        questions = [
+            "why did sales drop in 2023?",
+            "analyze the relationship between price and sales",
+            "Why are we losing customers and what factors drive churn in our business",
+            "what caused the anomaly",
+        ]
+
+        for question in questions:
+            with self.subTest(question=question):
+                query_type, _ = self.router.route_question(question)
+                self.assertEqual(query_type, QueryType.COMPLEX)
+
+    def test_scores_are_case_insensitive(self):
+        """Test pattern and keyword matching ignores case."""
+        _, lower = self.router.route_question("analyze the relationship between price and sales")
+        _, upper = self.router.route_question("ANALYZE the Relationship Between price and sales")
+        self.assertEqual(lower['simple_score'], upper['simple_score'])
+        self.assertEqual(lower['complex_score'], upper['complex_score'])
+
+    def test_keywords_next_to_punctuation_count(self):
+        """Test keywords are matched as whole words, not whitespace-split tokens."""
+        _, metadata = self.router.route_question("trend?")
+        self.assertEqual(metadata['complex_score'], 1)
+
+        _, metadata = self.router.route_question("forecast, forecast, forecast")
+        self.assertEqual(metadata['complex_score'], 2)  # keyword counted once, plus the pattern
+
+    def test_should_use_agentic(self):
+        """Test the boolean helper follows the routing decision."""
+        use_agentic, _ = self.router.should_use_agentic("why did sales drop in 2023?")
+        self.assertTrue(use_agentic)
+
+        use_agentic, _ = self.router.should_use_agentic("top 5")
+        self.assertFalse(use_agentic)
+
+
+if __name__ == '__main__':
+    unittest.main()
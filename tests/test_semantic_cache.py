@@ -0,0 +1,133 @@
+"""
+Tests for the semantic NL→SQL cache.
+"""
+import unittest
+import tempfile
+import os
+import shutil
+import sqlite3
+from unittest import mock
+from services.semantic_cache import SemanticCache, QuerySignature, _hashing_embedding, _question_literals
+
+
+class TestQuerySignature(unittest.TestCase):
+    """Test cases for SQL signature extraction."""
+
+    def test_signature_from_sql(self):
+        """Test tables, filters and aggregations are extracted."""
+        sql = (
+            "SELECT c.name, SUM(o.total) AS spend FROM customers c "
+            "JOIN orders o ON o.customer_id = c.id WHERE o.year = 2023 "
+            "GROUP BY c.name ORDER BY spend DESC LIMIT 10"
+        )
+        signature = QuerySignature.from_sql(sql)
+
+        self.assertEqual(signature.intent, "rank")
+        self.assertEqual(signature.tables, ["customers", "orders"])
+        self.assertEqual(signature.filter_columns, ["o.year"])
+        self.assertEqual(signature.aggregations, ["SUM"])
+
+    def test_signature_lookup_intent(self):
+        """Test plain selects are classified as lookups."""
+        signature = QuerySignature.from_sql("SELECT name FROM users LIMIT 500")
+        self.assertEqual(signature.intent, "lookup")
+        self.assertEqual(signature.aggregations, [])
+
+
+class TestQuestionLiterals(unittest.TestCase):
+    """Test cases for the reuse gate on question literals."""
+
+    def test_entities_and_directions_must_match(self):
+        """Test entity and direction swaps change the literals, rewording does not."""
+        base = "List the top 10 drivers from Germany sorted by wins ascending"
+        for other in [
+            "List the top 10 drivers from France sorted by wins ascending",
+            "List the top 10 drivers from Germany sorted by wins descending",
+            "List the bottom 10 drivers from Germany sorted by wins ascending",
+        ]:
+            with self.subTest(other=other):
+                self.assertNotEqual(_question_literals(base), _question_literals(other))
+        self.assertEqual(
+            _question_literals(base),
+            _question_literals("Show the top 10 drivers from Germany ordered by wins ascending"),
+        )
+
+
+class TestSemanticCache(unittest.TestCase):
+    """Test cases for SemanticCache."""
+
+    def setUp(self):
+        """Create a cache backed by a temporary SQLite file."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "cache.db")
+        self.cache = SemanticCache(db_path=self.db_path, embedding_fn=_hashing_embedding)
+        self.cache.high_threshold = 0.95
+        self.cache.low_threshold = 0.6
+
+    def tearDown(self):
+        """Clean up the temporary cache."""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_exact_question_hit(self):
+        """Test an identical question reuses the cached SQL."""
+        self.cache.store("top 5 customers by spend", "SELECT * FROM customers LIMIT 5")
+        self.assertEqual(self.cache.lookup("top 5 customers by spend"), "SELECT * FROM customers LIMIT 5")
+
+    def test_miss_on_unrelated_question(self):
+        """Test unrelated questions miss."""
+        self.cache.store("top 5 customers by spend", "SELECT * FROM customers LIMIT 5")
+        self.assertIsNone(self.cache.lookup("how many tracks are longer than five minutes"))
+
+    def test_different_literals_never_reused(self):
+        """Test numbers in the question must match for reuse."""
+        self.cache.store("top 5 customers by spend", "SELECT * FROM customers LIMIT 5")
+        self.assertIsNone(self.cache.lookup("top 10 customers by spend"))
+
+    def test_different_entities_never_reused(self):
+        """Test a near-duplicate question about another entity is not reused, even when confirmed."""
+        self.cache.store("List the top 10 drivers from Germany by total career wins",
+                         "SELECT * FROM drivers WHERE nationality = 'German' LIMIT 10")
+        self.assertIsNone(self.cache.lookup("List the top 10 drivers from France by total career wins",
+                                            confirm=lambda *args: True))
+
+    def test_grey_zone_uses_confirmation(self):
+        """Test near matches are only reused when confirmed."""
+        self.cache.store("top 5 customers by spend", "SELECT * FROM customers LIMIT 5")
+        question = "show the top 5 customers by spend"
+
+        self.assertIsNone(self.cache.lookup(question, confirm=lambda *args: False))
+        self.assertEqual(
+            self.cache.lookup(question, confirm=lambda *args: True),
+            "SELECT * FROM customers LIMIT 5"
+        )
+
+    def test_repeated_store_replaces_entry(self):
+        """Test storing the same question again updates its row instead of adding one."""
+        self.cache.store("count all orders", "SELECT COUNT(*) FROM orders")
+        self.cache.store("count all orders", "SELECT COUNT(id) FROM orders")
+
+        self.assertEqual(self.cache.lookup("count all orders"), "SELECT COUNT(id) FROM orders")
+        self.assertEqual(self.cache._matrix.shape[0], 1)
+        con = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(con.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0], 1)
+        finally:
+            con.close()
+
+    @mock.patch("services.semantic_cache.DatabaseService.get_schema_version", return_value="v1")
+    def test_namespace_checked_once_per_ttl(self, get_schema_version):
+        """Test lookups and stores within the TTL reuse the computed namespace."""
+        self.cache.store("count all orders", "SELECT COUNT(*) FROM orders")
+        for _ in range(3):
+            self.cache.lookup("count all orders")
+        self.assertEqual(get_schema_version.call_count, 1)
+
+    def test_entries_persist_across_instances(self):
+        """Test cached entries are reloaded from SQLite."""
+        self.cache.store("count all orders", "SELECT COUNT(*) FROM orders")
+        reloaded = SemanticCache(db_path=self.db_path, embedding_fn=_hashing_embedding)
+        self.assertEqual(reloaded.lookup("count all orders"), "SELECT COUNT(*) FROM orders")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Tests for Slack rate limiting and file uploads.
+"""
+import unittest
+from unittest import mock
+from services.slack import SlackRateLimiter, SlackService, TokenBucket
+
+
+class FakeClock:
+    """Deterministic clock whose sleep() just advances time."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test cases for TokenBucket."""
+
+    def test_burst_then_paced(self):
+        """Test the burst is free and further calls wait for a refill."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2.0, capacity=3, clock=clock, sleep=clock.sleep)
+
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(clock.slept, [])
+
+        bucket.acquire()
+        self.assertEqual(clock.slept, [0.5])
+
+    def test_limiter_keys_buckets_by_channel(self):
+        """Test chat.postMessage is limited per channel and unknown methods pass through."""
+        clock = FakeClock()
+        limiter = SlackRateLimiter({"chat.postMessage": (1.0, 1)}, clock=clock, sleep=clock.sleep)
+
+        limiter.acquire("chat.postMessage", "C1")
+        limiter.acquire("chat.postMessage", "C2")
+        limiter.acquire("users.info")
+        self.assertEqual(clock.slept, [])
+
+        limiter.acquire("chat.postMessage", "C1")
+        self.assertEqual(clock.slept, [1.0])
+
+
+class TestRateLimitRetry(unittest.TestCase):
+    """Test cases for 429 handling in SlackService."""
+
+    def _response(self, status_code, headers=None):
+        return mock.Mock(status_code=status_code, headers=headers or {})
+
+    @mock.patch("services.slack.time.sleep")
+    def test_429_replayed_after_retry_after(self, sleep):
+        """Test a rate-limited call is retried once after Retry-After."""
+        session = mock.Mock()
+        session.post.side_effect = [self._response(429, {"Retry-After": "2"}), self._response(200)]
+
+        with mock.patch("services.slack.config.HTTP_SESSION", session):
+            response = SlackService._api_post("users.info", json={})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session.post.call_count, 2)
+        sleep.assert_called_once_with(2.0)
+
+    @mock.patch("services.slack.time.sleep")
+    def test_long_retry_after_not_waited(self, sleep):
+        """Test an excessive Retry-After returns the 429 instead of blocking."""
+        session = mock.Mock()
+        session.post.return_value = self._response(429, {"Retry-After": "600"})
+
+        with mock.patch("services.slack.config.HTTP_SESSION", session):
+            response = SlackService._api_post("users.info", json={})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(session.post.call_count, 1)
+        sleep.assert_not_called()
+
+
+class TestUploadFile(unittest.TestCase):
+    """Test cases for the external upload flow."""
+
+    @mock.patch("services.slack.config.SLACK_BOT_TOKEN", "xoxb-test")
+    def test_stage_then_complete(self):
+        """Test the file is staged, uploaded and shared in one completeUploadExternal call."""
+        responses = {
+            "files.getUploadURLExternal": b'{"ok": true, "upload_url": "https://files.example/u1", "file_id": "F1"}',
+            "https://files.example/u1": b"OK",
+            "files.completeUploadExternal": b'{"ok": true}',
+        }
+
+        def post(url, **kwargs):
+            key = url.rsplit("/", 1)[-1] if url.startswith("https://slack.com") else url
+            return mock.Mock(status_code=200, ok=True, content=responses[key])
+
+        session = mock.Mock()
+        session.post.side_effect = post
+
+        with mock.patch("services.slack.config.HTTP_SESSION", session), \
+                mock.patch.object(SlackService, "_limiter", SlackRateLimiter({})):
+            success, _ = SlackService.upload_file("C1", b"a,b\n1,2\n", "export.csv", title="Export")
+
+        self.assertTrue(success)
+        urls = [call.args[0] for call in session.post.call_args_list]
+        self.assertEqual(urls[1], "https://files.example/u1")
+        self.assertTrue(urls[2].endswith("/files.completeUploadExternal"))
+        upload_kwargs = session.post.call_args_list[1].kwargs
+        self.assertEqual(upload_kwargs["headers"]["Content-Length"], "8")
+        self.assertIn(b'"id":"F1"', session.post.call_args_list[2].kwargs["data"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,10 +2,33 @@
 Utilities for formatting data and responses.
 """
 import json
+import math
 import re
-import pandas as pd
 import io
-from typing import List, Dict, Any
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from itertools import islice
+from typing import Iterable, List, Dict, Any, Optional, Tuple
+
+# Slack interaction helpers run on every button click; compile their patterns once
+CODE_BLOCK_RE = re.compile(r"```(.*?)```", re.DOTALL)
+SQL_PREFIX_RE = re.compile(r"^sql\n", re.IGNORECASE)
+PAGE_SUFFIX_RE = re.compile(r"<(\d+)>$")
+
+# Tables up to this many rows are formatted straight from the row dicts
+SMALL_TABLE_ROWS = 64
+
+# How NULLs (and keys missing from some rows) are shown in result tables
+MISSING_CELL = "None"
+
+# Rendered result pages, keyed by (SQL hash, page, rows per page) → (expires_at, table, pagination)
+PAGE_CACHE_SIZE = 512
+PAGE_CACHE_TTL = 60
+_page_cache = OrderedDict()
+_page_cache_lock = threading.Lock()
 
 
 def format_data_as_table(data: List[Dict[str, Any]], max_width: int = 30) -> str:
@@ -23,58 +46,56 @@ def format_data_as_table(data: List[Dict[str, Any]], max_width: int = 30) -> str
         return "```\n<no rows>\n```"
     
     try:
-        df = pd.DataFrame(data)
-        
-        # Truncate long values
-        def truncate_value(value, max_len=max_width):
-            value_str = str(value)
-            return value_str if len(value_str) <= max_len else value_str[:max_len-3] + "..."
-        
-        # Apply truncation using map() instead of deprecated applymap()
-        for col in df.columns:
-            df[col] = df[col].map(truncate_value)
+        if len(data) <= SMALL_TABLE_ROWS:
+            # A Slack page is a dozen rows: read the dicts directly, no DataFrame
+            columns = list(dict.fromkeys(key for row in data for key in row))
+            values = [[row.get(col) for col in columns] for row in data]
+        else:
+            # Imported here so importing the formatting helpers doesn't load pandas
+            import pandas as pd
+            # dtype=object keeps the values as returned; no int → float upcast around NULLs
+            df = pd.DataFrame(data, dtype=object)
+            columns = list(df.columns)
+            values = df.to_numpy(dtype=object).tolist()
         
-        # Calculate column widths
-        max_lengths = {}
-        for col in df.columns:
-            col_max = max(df[col].astype(str).apply(len).max(), len(col))
-            max_lengths[col] = min(col_max, max_width)
+        # Stringify, truncate and clean each cell in a single pass over the values;
+        # "|" and newlines are swapped 1:1, so widths are unaffected
+        def clean_cell(value) -> str:
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                value_str = MISSING_CELL
+            else:
+                value_str = str(value)
+            if len(value_str) > max_width:
+                value_str = value_str[:max_width-3] + "..."
+            return value_str.replace("\n", " ").replace("|", "/")
         
-        # Build table
-        result = "```\n"
+        rows = [[clean_cell(value) for value in row] for row in values]
+        widths = [
+            min(max(len(col), max(len(row[i]) for row in rows)), max_width)
+            for i, col in enumerate(columns)
+        ]
         
-        # Header
-        header = " | ".join(f"{col:{max_lengths[col]}}" for col in df.columns)
-        result += header + "\n"
-        
-        # Separator
-        separator = "-|-".join("-" * max_lengths[col] for col in df.columns)
-        result += separator + "\n"
-        
-        # Rows
-        for _, row in df.iterrows():
-            # Clean cell values to prevent table breaking
-            clean_cells = [str(cell).replace("\n", " ").replace("|", "/") for cell in row]
-            row_str = " | ".join(
-                f"{cell:{max_lengths[col]}}" 
-                for col, cell in zip(df.columns, clean_cells)
-            )
-            result += row_str + "\n"
-        
-        result += "```"
-        return result
+        # Header, separator and rows, built in one join. The row template is
+        # specialised to these widths once, so each row is a single format call.
+        row_format = " | ".join(f"{{:<{width}}}" for width in widths)
+        lines = [
+            " | ".join(f"{col:{width}}" for col, width in zip(columns, widths)),
+            "-|-".join("-" * width for width in widths),
+        ]
+        lines.extend(row_format.format(*row) for row in rows)
+        return "```\n" + "\n".join(lines) + "\n```"
         
     except Exception as e:
         return f"Failed to format table: {str(e)}"
 
 
-def paginate_query_results(data: List[Dict[str, Any]], page_number: int, 
+def paginate_query_results(data: Iterable[Dict[str, Any]], page_number: int, 
                           rows_per_page: int = 12) -> List[Dict[str, Any]]:
     """
     Paginate query results.
     
     Args:
-        data: Complete query results
+        data: Complete query results, as a list or a lazy iterator of rows
         page_number: Page number (1-based)
         rows_per_page: Number of rows per page
         
@@ -83,7 +104,10 @@ def paginate_query_results(data: List[Dict[str, Any]], page_number: int,
     """
     start_idx = max(0, (page_number - 1) * rows_per_page)
     end_idx = start_idx + rows_per_page
-    return data[start_idx:end_idx]
+    if isinstance(data, Sequence):
+        return data[start_idx:end_idx]
+    # Iterators are consumed only up to the end of the page
+    return list(islice(data, start_idx, end_idx))
 
 
 def calculate_pagination_info(total_rows: int, page_number: int, 
@@ -99,15 +123,14 @@ def calculate_pagination_info(total_rows: int, page_number: int,
     Returns:
         Dictionary with pagination info
     """
-    total_pages = max(1, (total_rows + rows_per_page - 1) // rows_per_page)
-    start_row = (page_number - 1) * rows_per_page + 1
-    end_row = min(page_number * rows_per_page, total_rows)
+    offset = (page_number - 1) * rows_per_page
+    total_pages = -(-total_rows // rows_per_page) or 1  # ceil division, at least one page
     
     return {
         "total_pages": total_pages,
         "current_page": page_number,
-        "start_row": start_row,
-        "end_row": end_row,
+        "start_row": offset + 1,
+        "end_row": min(offset + rows_per_page, total_rows),
         "total_rows": total_rows,
         "has_previous": page_number > 1,
         "has_next": page_number < total_pages,
@@ -129,13 +152,13 @@ def extract_sql_from_slack_message(payload: Dict[str, Any]) -> str:
     original_text = (payload.get("original_message") or {}).get("text") or ""
     
     # Look for SQL in code blocks
-    match = re.search(r"```(.*?)```", original_text, re.DOTALL)
+    match = CODE_BLOCK_RE.search(original_text)
     if not match:
         return ""
     
     sql = match.group(1).strip()
     # Clean up common prefixes and suffixes
-    sql = re.sub(r"^sql\n", "", sql, flags=re.IGNORECASE).strip()
+    sql = SQL_PREFIX_RE.sub("", sql).strip()
     sql = sql.rstrip(";").strip()
     
     return sql
@@ -152,13 +175,55 @@ def parse_page_command(command_text: str) -> tuple[str, int]:
         Tuple of (query_text, page_number)
     """
     # Look for page number pattern like "<2>" at the end
-    page_match = re.search(r"<(\d+)>$", command_text.strip())
+    command_text = command_text.strip()
+    page_match = PAGE_SUFFIX_RE.search(command_text)
     
     if page_match:
         page_number = int(page_match.group(1))
-        query_text = re.sub(r"\s*<\d+>$", "", command_text).strip()
+        query_text = command_text[:page_match.start()].strip()
     else:
         page_number = 1
-        query_text = command_text.strip()
+        query_text = command_text
     
-    return query_text, page_number
\ No newline at end of file
+    return query_text, page_number
+
+
+def _page_key(sql_query: str, page_number: int, rows_per_page: int) -> tuple:
+    return hashlib.blake2b(sql_query.encode(), digest_size=16).digest(), page_number, rows_per_page
+
+
+def get_cached_page(sql_query: str, page_number: int,
+                    rows_per_page: int = 12) -> Optional[Tuple[str, Dict[str, int]]]:
+    """
+    Return a recently rendered page of a query's results.
+    
+    Args:
+        sql_query: SQL that produced the results
+        page_number: Page number (1-based)
+        rows_per_page: Rows per page
+        
+    Returns:
+        Tuple of (formatted_table, pagination_info), or None if not cached or expired
+    """
+    key = _page_key(sql_query, page_number, rows_per_page)
+    with _page_cache_lock:
+        entry = _page_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, formatted_table, pagination = entry
+        if expires_at <= time.monotonic():
+            del _page_cache[key]
+            return None
+        _page_cache.move_to_end(key)
+        return formatted_table, pagination
+
+
+def cache_page(sql_query: str, page_number: int, rows_per_page: int,
+               formatted_table: str, pagination: Dict[str, int]):
+    """Remember a rendered page for PAGE_CACHE_TTL seconds."""
+    key = _page_key(sql_query, page_number, rows_per_page)
+    with _page_cache_lock:
+        _page_cache[key] = (time.monotonic() + PAGE_CACHE_TTL, formatted_table, pagination)
+        _page_cache.move_to_end(key)
+        while len(_page_cache) > PAGE_CACHE_SIZE:
+            _page_cache.popitem(last=False)